@@ -5,11 +5,17 @@ Build the final prompt by injecting product catalog into the template.
 Usage:
     python build_prompt.py
     python build_prompt.py --catalog data/products.json --output prompts/ready_prompt.md
+    python build_prompt.py --shards prompts/shards     # Category shards + router prompt
 """
 import argparse
 import json
+import re
 from pathlib import Path
 
+from scraper.catalog import FLAG_FIELDS, ColumnarCatalog
+from scraper.dedup import dedupe, normalize_name
+from scraper.profiling import DEFAULT_REPORT_DIR, phase, profiled
+
 
 # Paleo diet exclusion keywords (grains, dairy, legumes, processed)
 PALEO_EXCLUDE_KEYWORDS = [
@@ -19,122 +25,363 @@ PALEO_EXCLUDE_KEYWORDS = [
     'haricot', 'lentille', 'pois chiche', 'fève'
 ]
 
+_PALEO_EXCLUDE_RE = re.compile("|".join(re.escape(kw) for kw in PALEO_EXCLUDE_KEYWORDS))
+
 # Lite version: main meals + breakfast (no desserts, appetizers, fruits, other)
 LITE_TYPES = ['ready_meal', 'meat', 'fish', 'vegetable', 'bread', 'breakfast']
 
 # Sweets version: desserts, appetizers, fruits (for parties, snacks, entertaining)
 SWEETS_TYPES = ['dessert', 'appetizer', 'fruit']
 
-
-def is_paleo_excluded(product: dict) -> bool:
-    """Check if product should be excluded from paleo diet."""
-    text = (product['name'] + ' ' + product['category']).lower()
-    return any(kw in text for kw in PALEO_EXCLUDE_KEYWORDS)
-
-
-def filter_paleo(products: list) -> list:
+# Category shards: default max JSON size per shard (~15k tokens)
+DEFAULT_SHARD_SIZE = 60_000
+CATEGORY_SEPARATOR = ">"
+
+# Product orderings in the generated JSON (see ordered_rows); "category-ref"
+# is used by the cache layout
+ORDERS = ("catalog", "type-price", "category-ref")
+ORDER_NOTES = {
+    "catalog": "Products are listed in catalog order.",
+    "category-ref": (
+        "Products are sorted by category (`c`), then reference (`ref`); products added or updated "
+        "since the previous catalog version are listed at the end."
+    ),
+    "type-price": (
+        "Products are grouped by type (`t`), and sorted by price per serving (`ps`), cheapest first, "
+        "within each type (products without `ps` come last in their type). Use this order for "
+        "cheapest-first suggestions instead of re-sorting the catalog."
+    ),
+}
+
+# Template legend for the derived fields, filled in at {{DERIVED_LEGEND}}
+DERIVED_LEGEND = (
+    "- `ps`: Price per serving (EUR), precomputed from `p` and `s` - use it as is, do not recompute\n"
+    "- `p100`: Price per 100 g (EUR), precomputed from `p` and `w` when `pk` is missing"
+)
+
+# Prompt layouts: products where the template puts them, or last with a
+# stable order for provider prefix caching (see build_prompt)
+LAYOUTS = ("template", "cache")
+
+# Bits of the packed dietary flags in ColumnarCatalog.flags
+VEGETARIAN, VEGAN, GLUTEN_FREE, LACTOSE_FREE = (1 << FLAG_FIELDS.index(f) for f in FLAG_FIELDS)
+
+
+def is_paleo_excluded(text: str) -> bool:
+    """Check if a product name or category excludes it from paleo diet."""
+    return _PALEO_EXCLUDE_RE.search(text.lower()) is not None
+
+
+def filter_paleo(catalog: ColumnarCatalog, mask: int) -> int:
     """Filter products for paleo diet compatibility."""
     paleo_types = ['meat', 'fish', 'vegetable', 'fruit']
-    result = []
 
-    for p in products:
-        # Skip if excluded by keywords
-        if is_paleo_excluded(p):
-            continue
+    # Skip if excluded by keywords (categories are checked once each)
+    excluded = catalog.name_mask(is_paleo_excluded) | catalog.category_mask(is_paleo_excluded)
 
-        # Include base paleo types
-        if p['product_type'] in paleo_types:
-            result.append(p)
-        # Include ready_meals only if gluten-free AND lactose-free
-        elif p['product_type'] == 'ready_meal':
-            if p.get('is_gluten_free') and p.get('is_lactose_free'):
-                result.append(p)
-
-    return result
+    # Include base paleo types, and ready_meals only if gluten-free AND lactose-free
+    allowed = catalog.type_mask(paleo_types) | (
+        catalog.type_mask(['ready_meal'])
+        & catalog.flag_mask("is_gluten_free")
+        & catalog.flag_mask("is_lactose_free")
+    )
+    return mask & allowed & ~excluded
 
 
-def filter_lite(products: list) -> list:
+def filter_lite(catalog: ColumnarCatalog, mask: int) -> int:
     """Filter for lite version: main meals + breakfast, no desserts/appetizers."""
-    return [p for p in products if p['product_type'] in LITE_TYPES]
+    return mask & catalog.type_mask(LITE_TYPES)
 
 
-def filter_sweets(products: list) -> list:
+def filter_sweets(catalog: ColumnarCatalog, mask: int) -> int:
     """Filter for sweets version: desserts, appetizers, fruits."""
-    return [p for p in products if p['product_type'] in SWEETS_TYPES]
+    return mask & catalog.type_mask(SWEETS_TYPES)
+
+
+def apply_filters(catalog: ColumnarCatalog, filters: dict | None) -> int:
+    """Return the mask of products matching all active filters."""
+    mask = catalog.all_mask
+    if not filters:
+        return mask
+
+    # Special composite filters
+    if filters.get("paleo"):
+        mask = filter_paleo(catalog, mask)
+    if filters.get("lite"):
+        mask = filter_lite(catalog, mask)
+    if filters.get("sweets"):
+        mask = filter_sweets(catalog, mask)
+    # Simple boolean filters
+    if filters.get("vegetarian"):
+        mask &= catalog.flag_mask("is_vegetarian")
+    if filters.get("vegan"):
+        mask &= catalog.flag_mask("is_vegan")
+    if filters.get("gluten_free"):
+        mask &= catalog.flag_mask("is_gluten_free")
+    if filters.get("lactose_free"):
+        mask &= catalog.flag_mask("is_lactose_free")
+    return mask
+
+
+def ordered_rows(catalog: ColumnarCatalog, mask: int, order: str = "catalog") -> list[int]:
+    """
+    Selected rows in the requested order.
+
+    "catalog" keeps catalog order; "type-price" groups by product type and
+    sorts by price per serving (unknown last, then by price) within a type;
+    "category-ref" sorts by category, then ref (then name).
+    """
+    rows = list(catalog.iter_rows(mask))
+    if order == "type-price":
+        def key(i):
+            per_serving = catalog.price_per_serving(i)
+            return catalog.product_type(i), per_serving is None, per_serving or 0.0, catalog.prices[i]
+
+        rows.sort(key=key)
+    elif order == "category-ref":
+        rows.sort(key=lambda i: (catalog.category(i), catalog.refs[i] or "", catalog.names[i]))
+    elif order != "catalog":
+        raise ValueError(f"Unknown order: {order} (expected one of {', '.join(ORDERS)})")
+    return rows
+
+
+def encode_products(catalog: ColumnarCatalog, mask: int, derived: bool = True, order: str = "catalog") -> list[dict]:
+    """
+    Create a compact version of products for the prompt
+    (only include fields needed for recommendations).
+
+    With derived=True, metrics the LLM would otherwise compute in every
+    conversation are added: price per serving (ps) and price per 100 g
+    (p100, only when price per kg is unknown).
+    """
+    products_for_prompt = []
+    for i in ordered_rows(catalog, mask, order):
+        flags = catalog.flags[i]
+        product = {
+            "n": catalog.names[i],
+            "p": catalog.prices[i],
+            "c": catalog.category(i),
+            "t": catalog.product_type(i),
+            "vg": bool(flags & VEGETARIAN),
+            "vn": bool(flags & VEGAN),
+            "gf": bool(flags & GLUTEN_FREE),
+            "lf": bool(flags & LACTOSE_FREE),
+            "s": catalog.serving_count(i),
+            "w": catalog.weight_grams(i),
+        }
+        # Add new fields if present
+        if catalog.refs[i]:
+            product["ref"] = catalog.refs[i]
+        pk = catalog.price_per_kg(i)
+        if pk:
+            product["pk"] = pk  # pk = price per kg
+        ns = catalog.nutriscore(i)
+        if ns:
+            product["ns"] = ns  # ns = nutriscore
+        if derived:
+            ps = catalog.price_per_serving(i)
+            if ps is not None:
+                product["ps"] = round(ps, 2)
+            if not pk:
+                p100 = catalog.price_per_100g(i)
+                if p100 is not None:
+                    product["p100"] = round(p100, 2)
+        products_for_prompt.append(product)
+    return products_for_prompt
 
 
-def build_prompt(catalog_path: str, template_path: str, output_path: str, filters: dict = None) -> None:
-    """Build the final prompt with product data and optional filtering."""
+def check_encoding(derived: bool, order: str) -> None:
+    """Reject orders the prompt could not describe (type-price refers to ps)."""
+    if order == "type-price" and not derived:
+        raise ValueError("The type-price order needs the derived fields (ps)")
+
+
+def fill_legend(template: str, derived: bool, order: str) -> str:
+    """Fill the {{DERIVED_LEGEND}} and {{CATALOG_ORDER}} placeholders of a template."""
+    if derived:
+        template = template.replace("{{DERIVED_LEGEND}}", DERIVED_LEGEND)
+    else:
+        template = template.replace("{{DERIVED_LEGEND}}\n", "").replace("{{DERIVED_LEGEND}}", "")
+    return template.replace("{{CATALOG_ORDER}}", ORDER_NOTES[order])
+
+
+def estimate_tokens(chars: int) -> int:
+    """Rough token estimate for JSON text (~4 characters per token)."""
+    return chars // 4
+
+
+def load_catalog(catalog_path: str) -> tuple[ColumnarCatalog, int]:
+    """
+    Load the JSON catalog into columnar form, merging duplicates.
+
+    Returns:
+        Tuple of (catalog, number of duplicate records merged)
+    """
+    with phase("json_load"), open(catalog_path, "r", encoding="utf-8") as f:
+        products = json.load(f)["products"]
+
+    # Merge products listed under several URLs/categories
+    with phase("dedupe"):
+        deduped = dedupe(products)
+    with phase("columnar_build"):
+        columns = ColumnarCatalog.from_products(deduped)
+    return columns, len(products) - len(deduped)
+
+
+# The products block of a template: placeholder plus optional wrapper tags
+_PRODUCTS_BLOCK_RE = re.compile(r"\s*(?:<products>\s*)?\{\{PRODUCTS_JSON\}\}(?:\s*</products>)?\s*")
+
+
+def read_previous_items(path: Path) -> list[str]:
+    """
+    Serialized products of a previously built prompt, in prompt order.
+
+    Returns an empty list if the file is missing or has no parsable
+    <products> section.
+    """
+    if not path.exists():
+        return []
+    text = path.read_text(encoding="utf-8")
+    start = text.rfind("<products>\n")
+    end = text.find("\n</products>", start)
+    if start < 0 or end < 0:
+        return []
+    try:
+        products = json.loads(text[start + len("<products>\n"):end])
+    except json.JSONDecodeError:
+        return []
+    return [json.dumps(p, ensure_ascii=False) for p in products]
+
+
+def stable_order(items: list[str], previous: list[str]) -> tuple[list[str], int]:
+    """
+    Order serialized products so the previous build stays a prefix.
+
+    Products unchanged since the previous build keep their previous order
+    and come first; new or changed products follow in the given order.
+
+    Returns:
+        Tuple of (ordered items, number of unchanged items)
+    """
+    remaining: dict[str, int] = {}
+    for item in items:
+        remaining[item] = remaining.get(item, 0) + 1
+
+    head = []
+    for item in previous:
+        if remaining.get(item):
+            remaining[item] -= 1
+            head.append(item)
+
+    tail = []
+    for item in items:
+        if remaining.get(item):
+            remaining[item] -= 1
+            tail.append(item)
+    return head + tail, len(head)
+
+
+def cache_layout(template: str, products_json: str) -> str:
+    """Move the products block of a template after all static instructions."""
+    static = _PRODUCTS_BLOCK_RE.sub("\n\n", template, count=1).rstrip()
+    return f"{static}\n\n<products>\n{products_json}\n</products>\n"
+
+
+def stable_prefix_bytes(old: bytes, new: bytes) -> int:
+    """Length of the common leading bytes of two builds."""
+    n = min(len(old), len(new))
+    # Skip equal blocks, then compare byte by byte in the first differing one
+    i, block = 0, 4096
+    while i < n and old[i:i + block] == new[i:i + block]:
+        i += block
+    while i < n and old[i] == new[i]:
+        i += 1
+    return min(i, n)
+
+
+def build_prompt(
+    catalog_path: str,
+    template_path: str,
+    output_path: str,
+    filters: dict = None,
+    catalog: tuple[ColumnarCatalog, int] | None = None,
+    derived: bool = True,
+    order: str = "catalog",
+    layout: str = "template"
+) -> None:
+    """
+    Build the final prompt with product data and optional filtering.
+
+    catalog can be a preloaded result of load_catalog() to avoid reloading
+    the JSON when building several variations. derived and order are passed
+    to encode_products(); the template's {{CATALOG_ORDER}} placeholder is
+    replaced with a note describing the order.
+
+    layout="cache" makes the prompt friendly to LLM prefix caching: all
+    static instructions come first and the products last, sorted by
+    category then ref, except that products unchanged since the previous
+    build at output_path keep their position and new or changed products
+    are appended. The stable prefix versus the previous build is reported.
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout: {layout} (expected one of {', '.join(LAYOUTS)})")
+    if layout == "cache":
+        order = "category-ref"
+    check_encoding(derived, order)
 
     # Load catalog
-    with open(catalog_path, "r", encoding="utf-8") as f:
-        catalog = json.load(f)
+    columns, duplicates = catalog if catalog is not None else load_catalog(catalog_path)
 
     # Load template
     with open(template_path, "r", encoding="utf-8") as f:
         template = f.read()
 
     # Apply filters if provided
-    products = catalog["products"]
-    if filters:
-        # Special composite filters
-        if filters.get("paleo"):
-            products = filter_paleo(products)
-        if filters.get("lite"):
-            products = filter_lite(products)
-        if filters.get("sweets"):
-            products = filter_sweets(products)
-        # Simple boolean filters
-        if filters.get("vegetarian"):
-            products = [p for p in products if p.get("is_vegetarian")]
-        if filters.get("vegan"):
-            products = [p for p in products if p.get("is_vegan")]
-        if filters.get("gluten_free"):
-            products = [p for p in products if p.get("is_gluten_free")]
-        if filters.get("lactose_free"):
-            products = [p for p in products if p.get("is_lactose_free")]
-
-    # Create a compact version of products for the prompt
-    # (only include fields needed for recommendations)
-    products_for_prompt = []
-    for p in products:
-        product = {
-            "n": p["name"],
-            "p": p["price"],
-            "c": p["category"],
-            "t": p["product_type"],
-            "vg": p["is_vegetarian"],
-            "vn": p["is_vegan"],
-            "gf": p["is_gluten_free"],
-            "lf": p["is_lactose_free"],
-            "s": p.get("servings"),
-            "w": p.get("weight_grams"),
-        }
-        # Add new fields if present
-        if p.get("ref"):
-            product["ref"] = p["ref"]
-        if p.get("price_per_kg"):
-            product["pk"] = p["price_per_kg"]  # pk = price per kg
-        if p.get("nutriscore"):
-            product["ns"] = p["nutriscore"]  # ns = nutriscore
-        products_for_prompt.append(product)
-
-    products_json = json.dumps(products_for_prompt, ensure_ascii=False)
-
-    # Replace placeholder
-    final_prompt = template.replace("{{PRODUCTS_JSON}}", products_json)
+    with phase("filtering"):
+        mask = apply_filters(columns, filters)
+    with phase("serialization"):
+        products_for_prompt = encode_products(columns, mask, derived=derived, order=order)
+        if layout == "cache":
+            items = [json.dumps(p, ensure_ascii=False) for p in products_for_prompt]
+            items, unchanged = stable_order(items, read_previous_items(Path(output_path)))
+            products_json = "[" + ", ".join(items) + "]"
+        else:
+            products_json = json.dumps(products_for_prompt, ensure_ascii=False)
+
+    # Replace placeholders
+    final_prompt = fill_legend(template, derived, order)
+    if layout == "cache":
+        final_prompt = cache_layout(final_prompt, products_json)
+    else:
+        final_prompt = final_prompt.replace("{{PRODUCTS_JSON}}", products_json)
 
     # Save output
     output = Path(output_path)
     output.parent.mkdir(parents=True, exist_ok=True)
-    with open(output, "w", encoding="utf-8") as f:
+    previous_bytes = output.read_bytes() if layout == "cache" and output.exists() else b""
+    with phase("file_write"), open(output, "w", encoding="utf-8") as f:
         f.write(final_prompt)
 
     print(f"Built prompt with {len(products_for_prompt)} products")
+    if duplicates:
+        # Approximate: duplicates are assumed to be of average size and to
+        # pass the filters in the same proportion as the deduplicated catalog
+        avg_chars = len(products_json) / max(len(products_for_prompt), 1)
+        kept_ratio = len(products_for_prompt) / max(len(columns), 1)
+        saved = estimate_tokens(int(avg_chars * duplicates * kept_ratio))
+        print(f"  Merged duplicates: {duplicates} (~{saved:,} tokens saved)")
     if filters:
         active_filters = [k for k, v in filters.items() if v]
         if active_filters:
             print(f"  Applied filters: {', '.join(active_filters)}")
+    if layout == "cache":
+        new_bytes = final_prompt.encode("utf-8")
+        stable = stable_prefix_bytes(previous_bytes, new_bytes)
+        print(f"  Layout: cache ({unchanged} unchanged, {len(items) - unchanged} new or changed products at the end)")
+        print(f"  Stable prefix: {stable:,} of {len(new_bytes):,} bytes ({stable / len(new_bytes):.1%}) "
+              f"unchanged since the previous build")
+    elif order != "catalog":
+        print(f"  Order: {order}")
     print(f"  Catalog: {catalog_path}")
     print(f"  Template: {template_path}")
     print(f"  Output: {output_path}")
@@ -142,6 +389,205 @@ def build_prompt(catalog_path: str, template_path: str, output_path: str, filter
     print(f"Prompt size: {len(final_prompt):,} characters")
 
 
+def category_path(category: str, depth: int) -> list[str]:
+    """First `depth` levels of a category like 'Viandes et poissons > Volailles'."""
+    return [part.strip() for part in category.split(CATEGORY_SEPARATOR)][:depth]
+
+
+def _json_size(item_sizes: list[int]) -> int:
+    """Size of a JSON list given the sizes of its items ("[" a ", " b "]")."""
+    return sum(item_sizes) + 2 * max(len(item_sizes) - 1, 0) + 2
+
+
+def split_shards(
+    catalog: ColumnarCatalog,
+    mask: int,
+    max_chars: int,
+    depth: int = 1,
+    derived: bool = True
+) -> list[tuple[str, int, int]]:
+    """
+    Split products into shards along the category hierarchy.
+
+    Products are grouped by the first `depth` category levels (ignoring
+    accent/case variants). Groups over max_chars of JSON are split on the
+    next level, and groups that cannot be split further are cut into parts.
+    Rows keep catalog order inside a shard.
+
+    Returns:
+        List of (label, mask, JSON size) sorted by label
+    """
+    groups: dict[tuple, tuple[str, list[int], bool]] = {}
+    for i in catalog.iter_rows(mask):
+        full_path = category_path(catalog.category(i), depth + 1)
+        path = full_path[:depth]
+        key = tuple(normalize_name(part) for part in path)
+        label, rows, deeper = groups.get(key, (" > ".join(path), [], False))
+        rows.append(i)
+        groups[key] = (label, rows, deeper or len(full_path) > depth)
+
+    shards = []
+    for label, rows, deeper in groups.values():
+        group_mask = catalog.mask_from_rows(rows)
+        sizes = [len(json.dumps(p, ensure_ascii=False)) for p in encode_products(catalog, group_mask, derived)]
+        if _json_size(sizes) <= max_chars:
+            shards.append((label, group_mask, _json_size(sizes)))
+        elif deeper:
+            shards.extend(split_shards(catalog, group_mask, max_chars, depth + 1, derived))
+        else:
+            # Leaf category too large: cut into consecutive parts
+            parts, current, current_sizes = [], [], []
+            for row, row_size in zip(rows, sizes):
+                if current and _json_size([*current_sizes, row_size]) > max_chars:
+                    parts.append((current, current_sizes))
+                    current, current_sizes = [], []
+                current.append(row)
+                current_sizes.append(row_size)
+            parts.append((current, current_sizes))
+            for n, (part, part_sizes) in enumerate(parts, 1):
+                shards.append((f"{label} ({n}/{len(parts)})", catalog.mask_from_rows(part), _json_size(part_sizes)))
+
+    return sorted(shards, key=lambda shard: normalize_name(shard[0]))
+
+
+def dominant_type(catalog: ColumnarCatalog, mask: int) -> str:
+    """Most common product_type among the selected rows."""
+    counts: dict[str, int] = {}
+    for i in catalog.iter_rows(mask):
+        t = catalog.product_type(i)
+        counts[t] = counts.get(t, 0) + 1
+    return max(counts, key=counts.get)
+
+
+def pack_shards(catalog: ColumnarCatalog, shards: list[tuple[str, int, int]], max_chars: int) -> list[tuple[str, int, int]]:
+    """
+    Combine small shards with the same dominant product type.
+
+    Keeps the router short when the catalog has many small categories,
+    while a shard still covers one kind of product (desserts, fish, ...).
+    Members of a type group need not be neighbours in category order, so a
+    combined shard is labelled with all of its categories ("A; B; C").
+
+    Returns:
+        List of (label, mask, JSON size) ordered by dominant type, then label
+    """
+    by_type: dict[str, list[tuple[str, int, int]]] = {}
+    for shard in shards:
+        by_type.setdefault(dominant_type(catalog, shard[1]), []).append(shard)
+
+    result = []
+    for product_type in sorted(by_type):
+        groups, group, size = [], [], 0
+        for shard in by_type[product_type]:
+            if group and size + shard[2] > max_chars:
+                groups.append(group)
+                group, size = [], 0
+            group.append(shard)
+            size += shard[2]
+        groups.append(group)
+
+        for group in groups:
+            label = "; ".join(shard[0] for shard in group)
+            mask = 0
+            for _, shard_mask, _ in group:
+                mask |= shard_mask
+            result.append((label, mask, sum(shard[2] for shard in group)))
+    return result
+
+
+def shard_summary(catalog: ColumnarCatalog, mask: int) -> dict:
+    """Product count, price range and most common types of a shard."""
+    rows = list(catalog.iter_rows(mask))
+    prices = [catalog.prices[i] for i in rows]
+    types: dict[str, int] = {}
+    for i in rows:
+        t = catalog.product_type(i)
+        types[t] = types.get(t, 0) + 1
+    top_types = sorted(types.items(), key=lambda item: -item[1])[:3]
+    return {
+        "count": len(rows),
+        "min_price": min(prices),
+        "max_price": max(prices),
+        "types": ", ".join(f"{t} {n}" for t, n in top_types),
+    }
+
+
+def build_shards(
+    catalog_path: str,
+    template_path: str,
+    output_dir: str,
+    filters: dict = None,
+    max_chars: int = DEFAULT_SHARD_SIZE,
+    catalog: tuple[ColumnarCatalog, int] | None = None,
+    derived: bool = True,
+    order: str = "catalog"
+) -> None:
+    """
+    Build per-category shard files plus a router prompt listing them.
+
+    Writes output_dir/router_prompt.md (template with {{SHARDS_TABLE}}
+    filled in) and one output_dir/shard_<slug>.md per shard. Stale shard
+    files from previous builds are removed.
+    """
+    check_encoding(derived, order)
+    columns, _ = catalog if catalog is not None else load_catalog(catalog_path)
+    with phase("filtering"):
+        mask = apply_filters(columns, filters)
+    with phase("sharding"):
+        shards = pack_shards(columns, split_shards(columns, mask, max_chars, derived=derived), max_chars)
+
+    output = Path(output_dir)
+    output.mkdir(parents=True, exist_ok=True)
+    for stale in output.glob("shard_*.md"):
+        stale.unlink()
+
+    rows = ["| File | Category | Products | Price range | Main types |", "| :--- | :--- | ---: | :--- | :--- |"]
+    largest = 0
+    used_slugs = set()
+    for label, shard_mask, _ in shards:
+        base_slug = normalize_name(label).replace(" ", "-")[:80].rstrip("-") or "shard"
+        # Labels can normalize or truncate to the same slug; keep files distinct
+        slug, n = base_slug, 1
+        while slug in used_slugs:
+            n += 1
+            slug = f"{base_slug}-{n}"
+        used_slugs.add(slug)
+        file_name = f"shard_{slug}.md"
+        summary = shard_summary(columns, shard_mask)
+        with phase("serialization"):
+            products_json = json.dumps(encode_products(columns, shard_mask, derived, order), ensure_ascii=False)
+        largest = max(largest, len(products_json))
+
+        with phase("file_write"), open(output / file_name, "w", encoding="utf-8") as f:
+            f.write(f"# Picard catalog shard: {label}\n\n")
+            f.write(f"{summary['count']} products, €{summary['min_price']:.2f}–€{summary['max_price']:.2f}. ")
+            f.write("Use together with the router prompt.\n\n")
+            f.write(f'<products shard="{slug}">\n{products_json}\n</products>\n')
+
+        rows.append(
+            f"| {file_name} | {label} | {summary['count']} "
+            f"| €{summary['min_price']:.2f}–€{summary['max_price']:.2f} | {summary['types']} |"
+        )
+
+    with open(template_path, "r", encoding="utf-8") as f:
+        template = f.read()
+    router = fill_legend(template, derived, order).replace("{{SHARDS_TABLE}}", "\n".join(rows))
+    with phase("file_write"), open(output / "router_prompt.md", "w", encoding="utf-8") as f:
+        f.write(router)
+
+    print(f"Built {len(shards)} shards with {columns.count(mask)} products")
+    if filters:
+        active_filters = [k for k, v in filters.items() if v]
+        if active_filters:
+            print(f"  Applied filters: {', '.join(active_filters)}")
+    print(f"  Catalog: {catalog_path}")
+    print(f"  Router template: {template_path}")
+    print(f"  Output: {output_dir}")
+    print()
+    print(f"Router size: {len(router):,} characters")
+    print(f"Largest shard: {largest:,} characters (target {max_chars:,})")
+
+
 def main():
     parser = argparse.ArgumentParser(description="Build final prompt with product catalog")
     parser.add_argument(
@@ -197,16 +643,79 @@ def main():
         action="store_true",
         help="Sweets & snacks: desserts, appetizers, fruits (for parties and entertaining)"
     )
+    parser.add_argument(
+        "--order",
+        choices=ORDERS,
+        default="catalog",
+        help="Product order: catalog order, or grouped by type and cheapest per serving first (type-price)"
+    )
+    parser.add_argument(
+        "--layout",
+        choices=LAYOUTS,
+        default="template",
+        help="cache: static instructions first, products last in a stable order that keeps "
+             "LLM prefix caches valid across catalog updates (implies --order category-ref)"
+    )
+    parser.add_argument(
+        "--no-derived",
+        action="store_true",
+        help="Omit precomputed price per serving and price per 100 g"
+    )
+    parser.add_argument(
+        "--shards",
+        type=str,
+        metavar="DIR",
+        default=None,
+        help="Write per-category shards and a router prompt to DIR instead of a single prompt"
+    )
+    parser.add_argument(
+        "--shard-size",
+        type=int,
+        default=DEFAULT_SHARD_SIZE,
+        help=f"Max JSON characters per shard (default: {DEFAULT_SHARD_SIZE:,})"
+    )
+    parser.add_argument(
+        "--router-template",
+        type=str,
+        default="prompts/router_prompt.md",
+        help="Path to router prompt template (use with --shards)"
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const=str(DEFAULT_REPORT_DIR),
+        default=None,
+        metavar="DIR",
+        help=f"Write a CPU/memory/phase timing report (default dir: {DEFAULT_REPORT_DIR})"
+    )
     parser.add_argument(
         "--all",
         action="store_true",
         help="Generate all prompt variations (full + dietary filters)"
     )
     args = parser.parse_args()
-
+    if args.layout == "cache" and args.order != "catalog":
+        parser.error("--layout cache uses its own order (category, then ref); drop --order")
+    if args.order == "type-price" and args.no_derived:
+        parser.error("--order type-price sorts by price per serving (ps); drop --no-derived")
+    if args.all and args.shards:
+        parser.error("--all builds single-file prompts; use --shards with one set of filters at a time")
+    if args.layout == "cache" and args.shards:
+        parser.error("--layout cache applies to single prompts, not --shards")
+
+    with profiled(args.profile, "build_prompt"):
+        run(args)
+
+
+def run(args: argparse.Namespace) -> None:
+    """Build the prompt(s) selected by the command-line arguments."""
+    encoding = {"derived": not args.no_derived, "order": args.order}
     if args.all:
+        # Load once, reuse for every variation
+        catalog = load_catalog(args.catalog)
+
         # 1. Full prompt
-        build_prompt(args.catalog, args.template, args.output)
+        build_prompt(args.catalog, args.template, args.output, catalog=catalog, layout=args.layout, **encoding)
 
         # 2. Dietary variations
         variations = [
@@ -223,7 +732,8 @@ def main():
         for name, filters in variations:
             # Create filename like ready_prompt_vegan.md
             var_output = base_output.parent / f"{base_output.stem}_{name}{base_output.suffix}"
-            build_prompt(args.catalog, args.template, str(var_output), filters)
+            build_prompt(args.catalog, args.template, str(var_output), filters, catalog=catalog,
+                         layout=args.layout, **encoding)
     else:
         filters = {
             "vegetarian": args.vegetarian,
@@ -234,7 +744,10 @@ def main():
             "lite": args.lite,
             "sweets": args.sweets,
         }
-        build_prompt(args.catalog, args.template, args.output, filters)
+        if args.shards:
+            build_shards(args.catalog, args.router_template, args.shards, filters, args.shard_size, **encoding)
+        else:
+            build_prompt(args.catalog, args.template, args.output, filters, layout=args.layout, **encoding)
 
 
 if __name__ == "__main__":
@@ -6,11 +6,19 @@ Usage:
     python run_scraper.py --map              # Discover all product URLs
     python run_scraper.py --crawl            # Crawl pending URLs
     python run_scraper.py --crawl --limit 10 # Crawl 10 pending URLs
+    python run_scraper.py --crawl --workers 8  # Crawl with 8 concurrent fetches
+    python run_scraper.py --crawl --budget-credits 500  # Best catalog for 500 credits
     python run_scraper.py                    # Map + crawl all (legacy mode)
     python run_scraper.py --status           # Show current status
     python run_scraper.py --reset            # Delete all data and start fresh
+    python run_scraper.py --status --profile # Write a profiling report to profiles/
+    python run_scraper.py --crawl --archive  # Crawl and keep raw pages in data/pages.pack
+    python run_scraper.py --reextract        # Rerun local extraction over archived pages
+    python run_scraper.py --dedupe           # Merge duplicate products in the catalog
+    python run_scraper.py --extract-coverage tests/pages  # Local extraction coverage
 """
 import argparse
+from datetime import datetime
 from pathlib import Path
 
 from scraper.crawler import (
@@ -18,14 +26,20 @@ from scraper.crawler import (
     crawl_pending,
     crawl_all,
     reset_data,
+    reextract,
+    dedupe_catalog,
     retry_failed,
+    failure_summary,
     update_product_fields,
     get_products_missing_fields,
     load_url_state,
     load_catalog,
     DEFAULT_URLS_PATH,
     DEFAULT_PRODUCTS_PATH,
+    DEFAULT_JOURNAL_PATH,
 )
+from scraper.archive import PageArchive, DEFAULT_INDEX_PATH, DEFAULT_PACK_PATH
+from scraper.profiling import DEFAULT_REPORT_DIR, profiled
 
 
 def show_status():
@@ -40,11 +54,20 @@ def show_status():
     print(f"  Pending:  {len(state['pending']):,} URLs")
     print(f"  Crawled:  {len(state['crawled']):,} URLs")
     print(f"  Failed:   {len(state['failed']):,} URLs")
+    if state["failed"]:
+        summary = failure_summary(state)
+        print(f"    Retry now: {summary['eligible']:,}, waiting for backoff: {summary['waiting']:,}, "
+              f"quarantined: {summary['quarantined']:,}")
+        for error_class, count in summary["by_class"].items():
+            print(f"    {error_class}: {count:,}")
     if state["metadata"]["mapped_at"]:
         print(f"  Last mapped: {state['metadata']['mapped_at']}")
     if state["metadata"]["last_crawl_at"]:
         print(f"  Last crawl:  {state['metadata']['last_crawl_at']}")
 
+    if DEFAULT_JOURNAL_PATH.exists():
+        print(f"  Uncompacted crawl journal: {DEFAULT_JOURNAL_PATH} (applied on the next --workers run)")
+
     # Product catalog
     catalog = load_catalog()
     print(f"\nProduct Catalog ({DEFAULT_PRODUCTS_PATH}):")
@@ -57,6 +80,29 @@ def show_status():
     if missing:
         print(f"  Missing fields: {len(missing):,} products need update (use --update-fields)")
 
+    # Raw page archive
+    if DEFAULT_INDEX_PATH.exists():
+        stats = PageArchive().stats()
+        print(f"\nPage Archive ({DEFAULT_PACK_PATH}):")
+        print(f"  Pages: {stats['pages']:,} ({stats['blobs']:,} unique)")
+        print(f"  Size:  {stats['pack_bytes'] / 1024 / 1024:.1f} MB")
+
+    print()
+
+
+def show_extract_coverage(pages_dir: str):
+    """Display per-field coverage of local extraction over saved pages."""
+    from scraper.extractors import coverage_report
+
+    report = coverage_report(pages_dir)
+    pages = report["pages"]
+    print("=" * 50)
+    print("LOCAL EXTRACTION COVERAGE")
+    print("=" * 50)
+    print(f"\nPages: {pages:,} ({pages_dir})\n")
+    for field, count in report["fields"].items():
+        pct = 100 * count / pages if pages else 0
+        print(f"  {field:<16} {count:>6,} / {pages:,}  ({pct:5.1f}%)")
     print()
 
 
@@ -90,6 +136,35 @@ Examples:
         default=None,
         help="Limit number of URLs to crawl (use with --crawl)"
     )
+    parser.add_argument(
+        "--budget-credits",
+        type=int,
+        default=None,
+        help="Hard Firecrawl credit budget for this run; crawls in priority order (use with --crawl)"
+    )
+    parser.add_argument(
+        "--budget-requests",
+        type=int,
+        default=None,
+        help="Hard request budget for this run; crawls in priority order (use with --crawl)"
+    )
+    parser.add_argument(
+        "--refresh-days",
+        type=float,
+        default=None,
+        help="Also re-crawl products last fetched more than N days ago, by priority (use with --crawl)"
+    )
+    parser.add_argument(
+        "--prioritize",
+        action="store_true",
+        help="Crawl in priority order (new products, type balance, staleness, failures)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Crawl with the staged pipeline using N concurrent fetches (use with --crawl)"
+    )
     parser.add_argument(
         "--status",
         action="store_true",
@@ -103,21 +178,100 @@ Examples:
     parser.add_argument(
         "--retry-failed",
         action="store_true",
-        help="Move failed URLs back to pending for retry"
+        help="Move failed URLs whose retry backoff has elapsed back to pending"
+    )
+    parser.add_argument(
+        "--include-quarantined",
+        action="store_true",
+        help="With --retry-failed, also retry quarantined URLs (failed too many times)"
     )
     parser.add_argument(
         "--update-fields",
         action="store_true",
         help="Update existing products with missing fields (ref, price_per_kg, nutriscore)"
     )
+    parser.add_argument(
+        "--llm-only",
+        action="store_true",
+        help="Skip local HTML/JSON-LD extraction and use LLM extraction for every field"
+    )
+    parser.add_argument(
+        "--archive",
+        action="store_true",
+        help="Store each fetched raw page in data/pages.pack (use with --crawl/--update-fields)"
+    )
+    parser.add_argument(
+        "--reextract",
+        action="store_true",
+        help="Rerun local extraction over archived pages and update the catalog (no network)"
+    )
+    parser.add_argument(
+        "--dedupe",
+        action="store_true",
+        help="Merge products listed under several URLs (same ref or name+weight)"
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const=str(DEFAULT_REPORT_DIR),
+        default=None,
+        metavar="DIR",
+        help=f"Write a CPU/memory/phase timing report (default dir: {DEFAULT_REPORT_DIR})"
+    )
+    parser.add_argument(
+        "--extract-coverage",
+        metavar="DIR",
+        default=None,
+        help="Report per-field local extraction coverage over saved product pages in DIR"
+    )
 
     args = parser.parse_args()
+    scheduler_flags = args.prioritize or args.budget_credits or args.budget_requests or args.refresh_days is not None
+    if args.workers and scheduler_flags:
+        parser.error("--workers cannot be combined with --prioritize, --budget-* or --refresh-days "
+                     "(the scheduled crawl is sequential so the budget stays a hard cap)")
+
+    with profiled(args.profile, "run_scraper"):
+        run(args)
+
+
+def run(args: argparse.Namespace) -> None:
+    """Run the command selected by the command-line arguments."""
+    archive = PageArchive() if args.archive else None
 
     # Handle --status
     if args.status:
         show_status()
         return
 
+    # Handle --extract-coverage
+    if args.extract_coverage:
+        show_extract_coverage(args.extract_coverage)
+        return
+
+    # Handle --reextract
+    if args.reextract:
+        archive = PageArchive()
+        if not len(archive):
+            print("No archived pages. Crawl with --archive first.")
+            return
+
+        updated, orphans = reextract(archive)
+        print()
+        print("=" * 50)
+        print("Re-extraction complete!")
+        print(f"  Archived pages: {len(archive):,}")
+        print(f"  Updated products: {updated:,}")
+        if orphans:
+            print(f"  Pages not in catalog: {orphans:,}")
+        return
+
+    # Handle --dedupe
+    if args.dedupe:
+        before, after = dedupe_catalog()
+        print(f"Deduplicated catalog: {before:,} -> {after:,} products ({before - after:,} merged)")
+        return
+
     # Handle --reset
     if args.reset:
         confirm = input("This will delete all scraped data. Are you sure? [y/N] ")
@@ -136,8 +290,15 @@ Examples:
             print("No failed URLs to retry.")
             return
 
-        count = retry_failed()
+        summary = failure_summary(state)
+        count = retry_failed(include_quarantined=args.include_quarantined)
         print(f"Moved {count} failed URLs back to pending.")
+        if summary["waiting"]:
+            print(f"  {summary['waiting']:,} URLs are still waiting for their retry backoff")
+        if summary["quarantined"] and not args.include_quarantined:
+            print(f"  {summary['quarantined']:,} URLs are quarantined (use --include-quarantined to retry them)")
+        if count == 0:
+            return
         print()
         print("Next: Run 'python run_scraper.py --crawl' to retry")
         return
@@ -154,7 +315,7 @@ Examples:
             print(f"  Limit: {args.limit}")
         print()
 
-        updated, failed = update_product_fields(limit=args.limit)
+        updated, failed = update_product_fields(limit=args.limit, local=not args.llm_only, archive=archive)
 
         print()
         print("=" * 50)
@@ -182,6 +343,38 @@ Examples:
         return
 
     # Handle --crawl
+    scheduled = args.prioritize or args.budget_credits or args.budget_requests or args.refresh_days is not None
+    if args.crawl and scheduled:
+        from scraper.scheduler import crawl_scheduled
+
+        print("Crawling in priority order...")
+        if args.budget_credits:
+            print(f"  Credit budget: {args.budget_credits:,}")
+        if args.budget_requests:
+            print(f"  Request budget: {args.budget_requests:,}")
+        if args.refresh_days is not None:
+            print(f"  Refreshing products older than {args.refresh_days:g} days")
+        print()
+
+        result = crawl_scheduled(
+            limit=args.limit,
+            max_credits=args.budget_credits,
+            max_requests=args.budget_requests,
+            refresh_after_days=args.refresh_days,
+            local=not args.llm_only,
+            archive=archive,
+        )
+
+        print()
+        print("=" * 50)
+        print("Crawl complete!")
+        print(f"  Extracted: {result['extracted']} products")
+        print(f"  Duplicates skipped: {result['duplicates']} URLs")
+        print(f"  Refreshed: {result['refreshed']} products")
+        print(f"  Failed: {len(result['failed'])} URLs")
+        print(f"  Spent: {result['credits']:,} credits in {result['requests']:,} requests")
+        return
+
     if args.crawl:
         state = load_url_state()
         if not state["pending"]:
@@ -194,13 +387,22 @@ Examples:
             print(f"  Limit: {args.limit}")
         print()
 
-        products, failed = crawl_pending(limit=args.limit)
+        started_at = datetime.now().isoformat()
+        if args.workers:
+            from scraper.pipeline import crawl_pipelined
+
+            extracted, failed_count = crawl_pipelined(
+                limit=args.limit, local=not args.llm_only, archive=archive, workers=args.workers
+            )
+        else:
+            products, failed = crawl_pending(limit=args.limit, local=not args.llm_only, archive=archive)
+            extracted, failed_count = len(products), len(failed)
 
         print()
         print("=" * 50)
         print("Crawl complete!")
-        print(f"  Extracted: {len(products)} products")
-        print(f"  Failed: {len(failed)} URLs")
+        print(f"  Extracted: {extracted} products")
+        print(f"  Failed: {failed_count} URLs")
 
         # Show updated status
         state = load_url_state()
@@ -209,10 +411,15 @@ Examples:
         print(f"  Total products in catalog: {catalog['metadata']['product_count']:,}")
         print(f"  Remaining pending URLs: {len(state['pending']):,}")
 
-        if failed:
+        # Read from the ledger, so the pipeline never has to keep the list
+        failed_now = [
+            url for url, info in state["failures"].items()
+            if info["last_failed_at"] and info["last_failed_at"] >= started_at
+        ]
+        if failed_now:
             print()
             print("Failed URLs (first 5):")
-            for url in failed[:5]:
+            for url in failed_now[:5]:
                 print(f"  - {url}")
         return
 
@@ -222,7 +429,7 @@ Examples:
         print(f"  Limit: {args.limit or 'None (all products)'}")
         print()
 
-        products, failed = crawl_all(limit=args.limit)
+        products, failed = crawl_all(limit=args.limit, local=not args.llm_only, archive=archive)
 
         print()
         print("=" * 50)
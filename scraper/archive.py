@@ -0,0 +1,119 @@
+"""
+Compressed archive of raw product pages.
+
+Fetched pages (markdown + HTML) are stored content-addressed in a single
+append-only pack file, each blob zlib-compressed. A JSON index maps every
+URL to the hash of its latest page and every hash to its (offset, length)
+in the pack, so identical pages are stored once and any page can be read
+back without scanning the file. The index is rewritten every
+`save_every` new pages, so a crash loses at most that many paid-for pages.
+
+This lets extraction be rerun locally (`--reextract`) after schema or
+extractor changes, without fetching anything again.
+"""
+import hashlib
+import json
+import logging
+import threading
+import zlib
+from datetime import datetime
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PACK_PATH = Path("data/pages.pack")
+DEFAULT_INDEX_PATH = Path("data/pages.idx.json")
+DEFAULT_SAVE_EVERY = 50  # pages stored between index checkpoints
+
+
+class PageArchive:
+    """Append-only, content-addressed store of raw pages."""
+
+    def __init__(
+        self,
+        pack_path: Path = DEFAULT_PACK_PATH,
+        index_path: Path = DEFAULT_INDEX_PATH,
+        save_every: int = DEFAULT_SAVE_EVERY
+    ):
+        self.pack_path = Path(pack_path)
+        self.index_path = Path(index_path)
+        self.save_every = save_every
+        self._unsaved = 0
+        if self.index_path.exists():
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self.index = json.load(f)
+        else:
+            self.index = {"pages": {}, "blobs": {}}
+        # put() may be called from concurrent fetch workers
+        self._lock = threading.Lock()
+
+    def __contains__(self, url: str) -> bool:
+        return url in self.index["pages"]
+
+    def __len__(self) -> int:
+        return len(self.index["pages"])
+
+    def urls(self) -> list[str]:
+        """All archived URLs."""
+        return list(self.index["pages"])
+
+    def put(self, url: str, page: dict) -> str:
+        """
+        Store a page ({"markdown": ..., "html": ...}) for a URL.
+
+        Returns:
+            The content hash of the page
+        """
+        payload = json.dumps(page, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        digest = hashlib.sha256(payload).hexdigest()
+
+        blob = zlib.compress(payload, 9)
+
+        with self._lock:
+            if digest not in self.index["blobs"]:
+                self.pack_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.pack_path, "ab") as f:
+                    offset = f.tell()
+                    f.write(blob)
+                self.index["blobs"][digest] = {"offset": offset, "length": len(blob)}
+
+            self.index["pages"][url] = {"sha": digest, "fetched_at": datetime.now().isoformat()}
+            self._unsaved += 1
+            if self._unsaved >= self.save_every:
+                self._write_index()
+        return digest
+
+    def get(self, url: str) -> dict | None:
+        """Return the archived page for a URL, or None if not archived."""
+        entry = self.index["pages"].get(url)
+        if entry is None:
+            return None
+        blob = self.index["blobs"][entry["sha"]]
+        with open(self.pack_path, "rb") as f:
+            f.seek(blob["offset"])
+            data = f.read(blob["length"])
+        return json.loads(zlib.decompress(data).decode("utf-8"))
+
+    def save(self) -> None:
+        """Write the index to disk (the pack file is written on put)."""
+        with self._lock:
+            self._write_index()
+        logger.info(f"Saved page archive index ({len(self)} pages) to {self.index_path}")
+
+    def _write_index(self) -> None:
+        """Atomically replace the index file; the caller holds the lock."""
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.index, f, ensure_ascii=False)
+        tmp_path.replace(self.index_path)
+        self._unsaved = 0
+        logger.debug(f"Checkpointed page archive index ({len(self.index['pages'])} pages)")
+
+    def stats(self) -> dict:
+        """Page/blob counts and pack size in bytes."""
+        return {
+            "pages": len(self.index["pages"]),
+            "blobs": len(self.index["blobs"]),
+            "pack_bytes": self.pack_path.stat().st_size if self.pack_path.exists() else 0,
+        }
@@ -0,0 +1,275 @@
+"""
+Compact columnar in-memory representation of the product catalog.
+
+Instead of one dict per product, each field is stored as a column: typed
+arrays for numbers, interned codes for categories/types/NutriScore, and the
+four dietary flags packed into one byte per product. Filters work on row
+masks (a Python int, bit i = row i) that combine with `&` / `|`, and only
+the selected rows are materialized, which keeps prompt building fast on
+large catalogs.
+
+Row selections ("masks") are plain ints, so they compose freely:
+
+    catalog = ColumnarCatalog.load("data/products.json")
+    mask = catalog.flag_mask("is_vegan") & catalog.type_mask(["ready_meal"])
+    for i in catalog.iter_rows(mask):
+        ...
+
+Does not import pydantic; `to_products()` imports the schema lazily.
+"""
+import json
+import math
+from array import array
+from pathlib import Path
+
+FLAG_FIELDS = ("is_vegetarian", "is_vegan", "is_gluten_free", "is_lactose_free")
+NUTRISCORES = ("A", "B", "C", "D", "E")
+
+# Field order of scraper.schemas.Product, used to rebuild row dicts
+FIELD_ORDER = (
+    "name", "ref", "price", "price_per_kg", "category", "product_type", "url",
+    "image_url", "nutriscore", *FLAG_FIELDS, "weight_grams", "servings",
+    "categories", "alt_urls",
+)
+
+_NO_INT = -1  # None marker for integer columns
+
+
+class ColumnarCatalog:
+    """Product catalog stored as one column per field."""
+
+    def __init__(self):
+        self.names: list[str] = []
+        self.refs: list[str | None] = []
+        self.urls: list[str] = []
+        self.image_urls: list[str | None] = []
+        self.prices = array("d")
+        self.prices_per_kg = array("d")  # NaN = unknown
+        self.weights = array("l")  # _NO_INT = unknown
+        self.servings = array("l")  # _NO_INT = unknown
+        self.nutriscores = array("b")  # index in NUTRISCORES, -1 = unknown
+        self.flags = array("B")  # bit j set = FLAG_FIELDS[j] is true
+
+        # Interned string columns: code per row + code -> value table
+        self.category_codes = array("I")
+        self.category_values: list[str] = []
+        self.type_codes = array("B")
+        self.type_values: list[str] = []
+        self._category_lookup: dict[str, int] = {}
+        self._type_lookup: dict[str, int] = {}
+
+        # Column masks, built on first use
+        self._mask_cache: dict[tuple, int] = {}
+
+        # Sparse dedup columns (row -> list), most products have none
+        self.extra_categories: dict[int, list[str]] = {}
+        self.alt_urls: dict[int, list[str]] = {}
+
+    # -------------------------------------------------------------------------
+    # Construction
+    # -------------------------------------------------------------------------
+
+    @classmethod
+    def from_products(cls, products: list[dict]) -> "ColumnarCatalog":
+        """Build from catalog product dicts (as stored in products.json)."""
+        catalog = cls()
+        for product in products:
+            catalog.append(product)
+        return catalog
+
+    @classmethod
+    def load(cls, path: str | Path) -> "ColumnarCatalog":
+        """Load from a products.json catalog file."""
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_products(json.load(f)["products"])
+
+    def _intern(self, value: str, lookup: dict, values: list) -> int:
+        code = lookup.get(value)
+        if code is None:
+            code = lookup[value] = len(values)
+            values.append(value)
+        return code
+
+    def append(self, product: dict) -> int:
+        """Add one product dict and return its row index."""
+        row = len(self.names)
+        self._mask_cache.clear()
+
+        self.names.append(product["name"])
+        self.refs.append(product.get("ref"))
+        self.urls.append(product["url"])
+        self.image_urls.append(product.get("image_url"))
+        self.prices.append(float(product["price"]))
+        pk = product.get("price_per_kg")
+        self.prices_per_kg.append(math.nan if pk is None else float(pk))
+        weight = product.get("weight_grams")
+        self.weights.append(_NO_INT if weight is None else int(weight))
+        servings = product.get("servings")
+        self.servings.append(_NO_INT if servings is None else int(servings))
+        ns = product.get("nutriscore")
+        self.nutriscores.append(NUTRISCORES.index(ns) if ns in NUTRISCORES else -1)
+
+        self.category_codes.append(
+            self._intern(product["category"], self._category_lookup, self.category_values)
+        )
+        self.type_codes.append(
+            self._intern(product["product_type"], self._type_lookup, self.type_values)
+        )
+
+        packed = 0
+        for j, field in enumerate(FLAG_FIELDS):
+            if product.get(field):
+                packed |= 1 << j
+        self.flags.append(packed)
+
+        if product.get("categories"):
+            self.extra_categories[row] = list(product["categories"])
+        if product.get("alt_urls"):
+            self.alt_urls[row] = list(product["alt_urls"])
+
+        return row
+
+    # -------------------------------------------------------------------------
+    # Row access
+    # -------------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def all_mask(self) -> int:
+        """Mask selecting every row."""
+        return (1 << len(self)) - 1
+
+    @staticmethod
+    def iter_rows(mask: int):
+        """Yield the row indices set in a mask, in ascending order."""
+        # One O(n) conversion instead of a big-int operation per row
+        bits = bin(mask)[:1:-1]
+        row = bits.find("1")
+        while row != -1:
+            yield row
+            row = bits.find("1", row + 1)
+
+    @staticmethod
+    def count(mask: int) -> int:
+        """Number of rows selected by a mask."""
+        return mask.bit_count()
+
+    def mask_from_rows(self, rows) -> int:
+        """Mask with the given row indices set."""
+        bits = bytearray(b"0" * len(self))
+        for row in rows:
+            bits[row] = ord("1")
+        bits.reverse()
+        return int(bits, 2) if bits else 0
+
+    def _cached_mask(self, key: tuple, rows_fn) -> int:
+        mask = self._mask_cache.get(key)
+        if mask is None:
+            mask = self._mask_cache[key] = self.mask_from_rows(rows_fn())
+        return mask
+
+    def category(self, row: int) -> str:
+        return self.category_values[self.category_codes[row]]
+
+    def product_type(self, row: int) -> str:
+        return self.type_values[self.type_codes[row]]
+
+    def price_per_kg(self, row: int) -> float | None:
+        pk = self.prices_per_kg[row]
+        return None if math.isnan(pk) else pk
+
+    def weight_grams(self, row: int) -> int | None:
+        weight = self.weights[row]
+        return None if weight == _NO_INT else weight
+
+    def serving_count(self, row: int) -> int | None:
+        servings = self.servings[row]
+        return None if servings == _NO_INT else servings
+
+    def nutriscore(self, row: int) -> str | None:
+        ns = self.nutriscores[row]
+        return None if ns < 0 else NUTRISCORES[ns]
+
+    def flag(self, row: int, field: str) -> bool:
+        return bool(self.flags[row] >> FLAG_FIELDS.index(field) & 1)
+
+    # -------------------------------------------------------------------------
+    # Derived metrics
+    # -------------------------------------------------------------------------
+
+    def price_per_serving(self, row: int) -> float | None:
+        servings = self.servings[row]
+        return None if servings <= 0 else self.prices[row] / servings
+
+    def price_per_100g(self, row: int) -> float | None:
+        """From price_per_kg if known, else from price and weight."""
+        pk = self.price_per_kg(row)
+        if pk is not None:
+            return pk / 10
+        weight = self.weights[row]
+        return None if weight <= 0 else self.prices[row] * 100 / weight
+
+    def row(self, row: int) -> dict:
+        """Rebuild the product dict for a row (same shape as products.json)."""
+        values = {
+            "name": self.names[row],
+            "ref": self.refs[row],
+            "price": self.prices[row],
+            "price_per_kg": self.price_per_kg(row),
+            "category": self.category(row),
+            "product_type": self.product_type(row),
+            "url": self.urls[row],
+            "image_url": self.image_urls[row],
+            "nutriscore": self.nutriscore(row),
+            "weight_grams": self.weight_grams(row),
+            "servings": self.serving_count(row),
+            "categories": list(self.extra_categories.get(row, [])),
+            "alt_urls": list(self.alt_urls.get(row, [])),
+        }
+        packed = self.flags[row]
+        for j, field in enumerate(FLAG_FIELDS):
+            values[field] = bool(packed >> j & 1)
+        return {field: values[field] for field in FIELD_ORDER}
+
+    def to_dicts(self, mask: int | None = None) -> list[dict]:
+        """Product dicts for the selected rows (all rows by default)."""
+        rows = range(len(self)) if mask is None else self.iter_rows(mask)
+        return [self.row(i) for i in rows]
+
+    def to_products(self, mask: int | None = None) -> list:
+        """Validated `Product` models for the selected rows."""
+        from .schemas import Product
+
+        return [Product.model_validate(p) for p in self.to_dicts(mask)]
+
+    # -------------------------------------------------------------------------
+    # Masks
+    # -------------------------------------------------------------------------
+
+    def flag_mask(self, field: str) -> int:
+        """Rows where a dietary flag (e.g. 'is_vegan') is set."""
+        bit = 1 << FLAG_FIELDS.index(field)
+        return self._cached_mask(
+            ("flag", field),
+            lambda: (row for row, packed in enumerate(self.flags) if packed & bit),
+        )
+
+    def type_mask(self, product_types) -> int:
+        """Rows whose product_type is one of product_types."""
+        codes = {self._type_lookup[t] for t in product_types if t in self._type_lookup}
+        return self._cached_mask(
+            ("type", *sorted(codes)),
+            lambda: (row for row, code in enumerate(self.type_codes) if code in codes),
+        )
+
+    def category_mask(self, predicate) -> int:
+        """Rows whose (primary) category satisfies predicate(category)."""
+        # Evaluated once per distinct category, not once per row
+        codes = {code for code, value in enumerate(self.category_values) if predicate(value)}
+        return self.mask_from_rows(row for row, code in enumerate(self.category_codes) if code in codes)
+
+    def name_mask(self, predicate) -> int:
+        """Rows whose name satisfies predicate(name)."""
+        return self.mask_from_rows(row for row, name in enumerate(self.names) if predicate(name))
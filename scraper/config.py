@@ -5,5 +5,13 @@ load_dotenv()
 
 FIRECRAWL_API_KEY = os.getenv("FIRECRAWL_API_KEY")
 
-if not FIRECRAWL_API_KEY:
-    raise ValueError("FIRECRAWL_API_KEY not found in .env file")
+
+def require_api_key() -> str:
+    """Return the Firecrawl API key, raising if it is not configured.
+
+    Checked lazily so offline commands (--status, --reset, --retry-failed)
+    work without a key.
+    """
+    if not FIRECRAWL_API_KEY:
+        raise ValueError("FIRECRAWL_API_KEY not found in .env file")
+    return FIRECRAWL_API_KEY
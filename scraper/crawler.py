@@ -1,21 +1,64 @@
 import json
 import logging
-from datetime import datetime
+from collections import Counter
+from datetime import datetime, timedelta
 from pathlib import Path
 
-from firecrawl import FirecrawlApp
-
-from .config import FIRECRAWL_API_KEY
+from .archive import PageArchive
+from .dedup import DedupIndex, dedupe, merge_products
+from .extractors import PRODUCT_FIELDS, REQUIRED_FIELDS, extract_local, guess_product_type, missing_fields
+from .profiling import phase
 from .schemas import Product
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FirecrawlApp(api_key=FIRECRAWL_API_KEY)
-
 # Default paths
 DEFAULT_URLS_PATH = Path("data/urls.json")
 DEFAULT_PRODUCTS_PATH = Path("data/products.json")
+# Written by the staged pipeline (scraper.pipeline); defined here so callers
+# can check for it without importing asyncio
+DEFAULT_JOURNAL_PATH = Path("data/crawl.journal.jsonl")
+
+# Failed URLs become eligible for --retry-failed after an exponential backoff
+# (base delay doubled per attempt, capped) and are quarantined, i.e. never
+# retried automatically, once they have failed this many times
+RETRY_BASE_DELAY = timedelta(hours=1)
+RETRY_MAX_DELAY = timedelta(days=7)
+QUARANTINE_AFTER = 5
+
+
+# =============================================================================
+# Extraction Client
+# =============================================================================
+
+# Created on first use so that importing this module does not require the
+# firecrawl SDK or an API key (offline commands never touch the network).
+_client = None
+
+
+def get_client():
+    """Return the extraction client, building a FirecrawlApp on first use."""
+    global _client
+    if _client is None:
+        from firecrawl import FirecrawlApp
+
+        from .config import require_api_key
+
+        _client = FirecrawlApp(api_key=require_api_key())
+    return _client
+
+
+def set_client(client) -> None:
+    """
+    Replace the extraction client (e.g. a fake for tests or another backend).
+
+    The client must expose `map_url(url, search=...)` and
+    `scrape_url(url, formats=..., extract=...)`, or the same methods under
+    a `.v1` attribute. Pass None to fall back to the default FirecrawlApp.
+    """
+    global _client
+    _client = client
 
 
 # =============================================================================
@@ -25,8 +68,10 @@ DEFAULT_PRODUCTS_PATH = Path("data/products.json")
 def load_url_state(path: Path = DEFAULT_URLS_PATH) -> dict:
     """Load URL tracking state from JSON file."""
     if path.exists():
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        with phase("json_load"), open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        _migrate_failures(state)
+        return state
     return {
         "metadata": {
             "mapped_at": None,
@@ -34,18 +79,126 @@ def load_url_state(path: Path = DEFAULT_URLS_PATH) -> dict:
         },
         "pending": [],
         "crawled": [],
-        "failed": []
+        "failed": [],
+        "failures": {}
     }
 
 
+def _migrate_failures(state: dict) -> None:
+    """Give failed URLs from older state files a ledger entry."""
+    ledger = state.setdefault("failures", {})
+    for url in state["failed"]:
+        if url not in ledger:
+            ledger[url] = {
+                "attempts": 1,
+                "error_class": "Unknown",
+                "error": None,
+                "last_failed_at": None,
+                "next_retry_at": None,
+                "quarantined": False,
+            }
+
+
 def save_url_state(state: dict, path: Path = DEFAULT_URLS_PATH) -> None:
     """Save URL tracking state to JSON file."""
     path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
+    with phase("file_write"), open(path, "w", encoding="utf-8") as f:
         json.dump(state, f, ensure_ascii=False, indent=2)
     logger.info(f"Saved URL state to {path}")
 
 
+def mark_crawled(state: dict, url: str, now: datetime | None = None) -> None:
+    """Record a successfully crawled URL (and when, for refresh scheduling)."""
+    state["crawled"].append(url)
+    state.setdefault("crawled_at", {})[url] = (now or datetime.now()).isoformat()
+    state.setdefault("failures", {}).pop(url, None)
+
+
+def failure_info(error: Exception | None) -> dict:
+    """Error class and (first line of the) message recorded for a failure."""
+    if error is None:
+        return {"error_class": "Unknown", "error": None}
+    # First line only: pydantic and HTTP errors can span many lines
+    return {"error_class": type(error).__name__, "error": str(error).strip().split("\n", 1)[0][:300]}
+
+
+def record_failure(
+    state: dict,
+    url: str,
+    error: Exception | dict | None = None,
+    now: datetime | None = None
+) -> dict:
+    """
+    Update the failure ledger entry of a URL (without touching the failed list).
+
+    Each failure increments the attempt count, stores the error class and
+    message, and schedules the next retry with exponential backoff; after
+    QUARANTINE_AFTER attempts the URL is quarantined instead. error may be
+    the exception or a failure_info() dict.
+
+    Returns:
+        The ledger entry
+    """
+    now = now or datetime.now()
+    entry = state.setdefault("failures", {}).setdefault(url, {"attempts": 0})
+    entry["attempts"] += 1
+    entry.update(error if isinstance(error, dict) else failure_info(error))
+    entry["last_failed_at"] = now.isoformat()
+    entry["quarantined"] = entry["attempts"] >= QUARANTINE_AFTER
+    if entry["quarantined"]:
+        entry["next_retry_at"] = None
+    else:
+        delay = min(RETRY_BASE_DELAY * 2 ** (entry["attempts"] - 1), RETRY_MAX_DELAY)
+        entry["next_retry_at"] = (now + delay).isoformat()
+    return entry
+
+
+def mark_failed(state: dict, url: str, error: Exception | dict | None = None, now: datetime | None = None) -> None:
+    """Record a failed URL and the failure in the ledger."""
+    if url not in state["failed"]:
+        state["failed"].append(url)
+    record_failure(state, url, error, now)
+
+
+def failure_attempts(state: dict, url: str) -> int:
+    """Number of recorded failures of a URL since its last success."""
+    entry = state.get("failures", {}).get(url)
+    return entry["attempts"] if entry else 0
+
+
+def _retry_eligible(entry: dict, now: datetime, include_quarantined: bool) -> bool:
+    if entry.get("quarantined") and not include_quarantined:
+        return False
+    next_retry_at = entry.get("next_retry_at")
+    return next_retry_at is None or datetime.fromisoformat(next_retry_at) <= now
+
+
+def failure_summary(state: dict, now: datetime | None = None) -> dict:
+    """
+    Break down failed URLs for reporting.
+
+    Returns:
+        Dict with by_class (error class -> count, most common first), and
+        counts of URLs eligible for retry now, waiting for their backoff,
+        and quarantined
+    """
+    now = now or datetime.now()
+    ledger = state.get("failures", {})
+    by_class = Counter()
+    summary = {"eligible": 0, "waiting": 0, "quarantined": 0}
+    for url in dict.fromkeys(state["failed"]):
+        entry = ledger.get(url, {})
+        by_class[entry.get("error_class", "Unknown")] += 1
+        if entry.get("quarantined"):
+            summary["quarantined"] += 1
+        elif _retry_eligible(entry, now, include_quarantined=False):
+            summary["eligible"] += 1
+        else:
+            summary["waiting"] += 1
+    summary["by_class"] = dict(by_class.most_common())
+    return summary
+
+
 def reset_data(urls_path: Path = DEFAULT_URLS_PATH, products_path: Path = DEFAULT_PRODUCTS_PATH) -> None:
     """Delete both URL state and products files."""
     for path in [urls_path, products_path]:
@@ -56,23 +209,40 @@ def reset_data(urls_path: Path = DEFAULT_URLS_PATH, products_path: Path = DEFAUL
             logger.info(f"{path} does not exist, skipping")
 
 
-def retry_failed(urls_path: Path = DEFAULT_URLS_PATH) -> int:
-    """Move all failed URLs back to pending for retry."""
+def retry_failed(
+    urls_path: Path = DEFAULT_URLS_PATH,
+    include_quarantined: bool = False,
+    now: datetime | None = None
+) -> int:
+    """
+    Move failed URLs whose backoff has elapsed back to pending for retry.
+
+    URLs still waiting for their next retry time stay failed, as do
+    quarantined URLs unless include_quarantined is set. Ledger entries are
+    kept, so a URL that fails again continues its backoff schedule.
+
+    Returns:
+        Number of URLs moved to pending
+    """
     state = load_url_state(urls_path)
 
-    failed_count = len(state["failed"])
-    if failed_count == 0:
+    if not state["failed"]:
         logger.info("No failed URLs to retry.")
         return 0
 
-    # Move failed to pending
-    state["pending"].extend(state["failed"])
-    state["failed"] = []
+    now = now or datetime.now()
+    ledger = state["failures"]
+    retry = [url for url in dict.fromkeys(state["failed"]) if _retry_eligible(ledger.get(url, {}), now, include_quarantined)]
+    retry_set = set(retry)
+
+    # Move eligible failed URLs to pending
+    state["pending"].extend(url for url in retry if url not in state["pending"])
+    state["failed"] = [url for url in state["failed"] if url not in retry_set]
 
     save_url_state(state, urls_path)
-    logger.info(f"Moved {failed_count} failed URLs back to pending")
+    logger.info(f"Moved {len(retry)} failed URLs back to pending ({len(state['failed'])} still held back)")
 
-    return failed_count
+    return len(retry)
 
 
 # =============================================================================
@@ -86,13 +256,15 @@ def map_urls(urls_path: Path = DEFAULT_URLS_PATH) -> dict:
     """
     logger.info("Mapping product URLs from picard.fr...")
 
-    result = app.map_url(
-        "https://www.picard.fr",
-        search="produits"
-    ) if hasattr(app, 'map_url') else app.v1.map_url(
-        "https://www.picard.fr",
-        search="produits"
-    )
+    app = get_client()
+    with phase("network"):
+        result = app.map_url(
+            "https://www.picard.fr",
+            search="produits"
+        ) if hasattr(app, 'map_url') else app.v1.map_url(
+            "https://www.picard.fr",
+            search="produits"
+        )
 
     if isinstance(result, dict):
         urls = result.get("links", [])
@@ -134,63 +306,179 @@ def map_urls(urls_path: Path = DEFAULT_URLS_PATH) -> dict:
 # Product Extraction (Crawling)
 # =============================================================================
 
-def extract_product(url: str) -> Product | None:
-    """Extract product data from a single URL."""
-    try:
-        result = app.scrape_url(
-            url,
-            formats=["extract"],
-            extract={
-                "schema": Product.model_json_schema(),
-                "prompt": """Extract the product information from this Picard frozen food product page:
+EXTRACT_PROMPT = """Extract the product information from this Picard frozen food product page:
 - ref: Product reference ID (e.g., '060489' from 'Ref.: 060489' or from the URL)
 - price_per_kg: Price per kilogram if shown (e.g., 24.97 from '€24,97/kg')
 - nutriscore: NutriScore rating (A, B, C, D, or E) - look for nutriscore image/badge
 - Dietary flags (vegetarian, vegan, gluten-free, lactose-free) from ingredients or labels"""
-            }
-        ) if hasattr(app, 'scrape_url') else app.v1.scrape_url(
-            url,
-            formats=["extract"],
-            extract={
-                "schema": Product.model_json_schema(),
-                "prompt": """Extract the product information from this Picard frozen food product page:
-- ref: Product reference ID (e.g., '060489' from 'Ref.: 060489' or from the URL)
-- price_per_kg: Price per kilogram if shown (e.g., 24.97 from '€24,97/kg')
-- nutriscore: NutriScore rating (A, B, C, D, or E) - look for nutriscore image/badge
-- Dietary flags (vegetarian, vegan, gluten-free, lactose-free) from ingredients or labels"""
-            }
-        )
 
-        if isinstance(result, dict):
-            extract_data = result.get("extract", {})
-        elif hasattr(result, "extract"):
-            extract_data = result.extract
-        elif hasattr(result, "data") and isinstance(result.data, dict):
-            extract_data = result.data.get("extract", {})
-        else:
-            logger.warning(f"Unexpected response format from Firecrawl: {type(result)}")
-            return None
-
-        if extract_data:
-            if isinstance(extract_data, dict):
-                extract_data["url"] = url
-                return Product.model_validate(extract_data)
-            else:
-                data_dict = extract_data.model_dump() if hasattr(extract_data, "model_dump") else dict(extract_data)
-                data_dict["url"] = url
-                return Product.model_validate(data_dict)
 
+class UnexpectedResponse(Exception):
+    """Raised when Firecrawl returns a response shape we don't recognize."""
+
+
+class EmptyExtraction(Exception):
+    """Raised when neither local nor LLM extraction found any product data."""
+
+
+def _scrape(app, url: str, **kwargs):
+    """Call scrape_url on either the current or the v1 Firecrawl SDK."""
+    with phase("network"):
+        if hasattr(app, 'scrape_url'):
+            return app.scrape_url(url, **kwargs)
+        return app.v1.scrape_url(url, **kwargs)
+
+
+def _response_field(result, name: str):
+    """Read a format (extract, markdown, html) from a Firecrawl response."""
+    if isinstance(result, dict):
+        if name in result:
+            return result[name]
+        if isinstance(result.get("data"), dict):
+            return result["data"].get(name)
         return None
+    if hasattr(result, name):
+        return getattr(result, name)
+    if hasattr(result, "data") and isinstance(result.data, dict):
+        return result.data.get(name)
+    raise UnexpectedResponse(f"Unexpected response format from Firecrawl: {type(result)}")
+
+
+def _llm_schema(fields: list[str]) -> dict:
+    """Product JSON schema restricted to the given fields."""
+    schema = Product.model_json_schema()
+    schema["properties"] = {k: v for k, v in schema["properties"].items() if k in fields}
+    schema["required"] = [k for k in schema.get("required", []) if k in fields]
+    return schema
+
+
+def fetch_page(url: str) -> dict:
+    """Fetch a page's raw markdown and HTML (no LLM extraction)."""
+    result = _scrape(get_client(), url, formats=["markdown", "html"])
+    return {
+        "markdown": _response_field(result, "markdown") or "",
+        "html": _response_field(result, "html") or "",
+    }
+
+
+def extract_with_llm(url: str, fields: list[str] | None = None, archive: PageArchive | None = None) -> dict:
+    """
+    Run Firecrawl's LLM extraction, optionally limited to some fields.
+
+    If an archive is given, the raw page is requested in the same call and
+    stored, so the page is fetched only once.
+    """
+    schema = _llm_schema(fields or PRODUCT_FIELDS)
+    formats = ["extract"] if archive is None else ["extract", "markdown", "html"]
+    result = _scrape(
+        get_client(),
+        url,
+        formats=formats,
+        extract={"schema": schema, "prompt": EXTRACT_PROMPT},
+    )
+    if archive is not None:
+        archive.put(url, {
+            "markdown": _response_field(result, "markdown") or "",
+            "html": _response_field(result, "html") or "",
+        })
+
+    extract_data = _response_field(result, "extract")
+    if not extract_data:
+        return {}
+    if isinstance(extract_data, dict):
+        return extract_data
+    return extract_data.model_dump() if hasattr(extract_data, "model_dump") else dict(extract_data)
+
+
+def fetch_product_fields(
+    url: str,
+    local: bool = True,
+    archive: PageArchive | None = None,
+    needed: list[str] | None = None
+) -> dict:
+    """
+    Fetch a product page and extract its raw fields, without validation.
+
+    With local=True the page is fetched as markdown/HTML and parsed by the
+    deterministic extractors first. LLM extraction is only requested if they
+    left one of the needed fields (default: REQUIRED_FIELDS) empty, and then
+    only for the fields still empty. Nullable and default-False fields alone
+    never trigger it. If an archive is given, the raw page is stored in it.
 
+    product_type is rarely in the markup, so it is asked from the LLM; the
+    URL slug guess is only used if the LLM returns no type either.
+
+    Returns:
+        Field dict including url, or {} if nothing could be extracted
+    """
+    fields = {}
+    if local:
+        page = fetch_page(url)
+        if archive is not None:
+            archive.put(url, page)
+        fields = extract_local(url, html=page["html"], markdown=page["markdown"])
+
+    needed = needed or REQUIRED_FIELDS
+    if not local or missing_fields(fields, needed):
+        missing = missing_fields(fields)
+        # In LLM-only mode the raw page for the archive comes with the same call
+        llm_data = extract_with_llm(url, missing if fields else None, archive=None if local else archive)
+        for key, value in llm_data.items():
+            if value is not None and fields.get(key) is None:
+                fields[key] = value
+        logger.debug(f"  LLM asked for {len(missing)} fields: {', '.join(missing)}")
+
+    if fields and "product_type" in needed and fields.get("product_type") is None:
+        product_type = guess_product_type(url)
+        if product_type:
+            fields["product_type"] = product_type
+            logger.debug(f"  No product_type extracted, guessed {product_type} from the URL")
+
+    if fields:
+        fields["url"] = url
+    return fields
+
+
+def try_extract_product(
+    url: str,
+    local: bool = True,
+    archive: PageArchive | None = None
+) -> tuple[Product | None, Exception | None]:
+    """
+    Extract product data from a single URL, logging failures.
+
+    Returns:
+        Tuple of (product, None) on success or (None, error) on failure
+    """
+    # Resolved outside the try so a missing SDK/key aborts the run instead of
+    # marking every URL as failed.
+    get_client()
+    try:
+        fields = fetch_product_fields(url, local=local, archive=archive)
+        if not fields:
+            raise EmptyExtraction(f"No product data extracted from {url}")
+        with phase("validation"):
+            return Product.model_validate(fields), None
+
+    except (UnexpectedResponse, EmptyExtraction) as e:
+        logger.warning(str(e))
+        return None, e
     except Exception as e:
         logger.error(f"Failed to extract product from {url}: {e}")
-        return None
+        return None, e
+
+
+def extract_product(url: str, local: bool = True, archive: PageArchive | None = None) -> Product | None:
+    """Extract product data from a single URL (see fetch_product_fields)."""
+    return try_extract_product(url, local=local, archive=archive)[0]
 
 
 def crawl_pending(
     limit: int | None = None,
     urls_path: Path = DEFAULT_URLS_PATH,
-    products_path: Path = DEFAULT_PRODUCTS_PATH
+    products_path: Path = DEFAULT_PRODUCTS_PATH,
+    local: bool = True,
+    archive: PageArchive | None = None
 ) -> tuple[list[Product], list[str]]:
     """
     Crawl pending URLs and append products to catalog.
@@ -199,9 +487,14 @@ def crawl_pending(
         limit: Max number of URLs to crawl in this run
         urls_path: Path to URL state file
         products_path: Path to products catalog file
+        local: Try local HTML/JSON-LD extraction before the LLM
+        archive: Optional archive to store each fetched raw page in
 
     Returns:
         Tuple of (newly extracted products, failed URLs)
+
+    URLs whose ref (from the URL) is already in the catalog are not fetched;
+    they are recorded as alternate URLs of the existing product.
     """
     # Load URL state
     state = load_url_state(urls_path)
@@ -217,19 +510,30 @@ def crawl_pending(
 
     new_products: list[Product] = []
     new_failed: list[str] = []
+    duplicate_urls: list[str] = []
+    index = DedupIndex(load_catalog(products_path)["products"])
 
-    for i, url in enumerate(urls_to_crawl, 1):
+    for i, url in enumerate(list(urls_to_crawl), 1):
         logger.info(f"Processing {i}/{len(urls_to_crawl)}: {url}")
 
-        product = extract_product(url)
+        known = index.find_url(url)
+        if known is not None:
+            duplicate_urls.append(url)
+            mark_crawled(state, url)
+            state["pending"].remove(url)
+            logger.info(f"  -> Duplicate of {known['url']} (ref {known.get('ref')}), skipped")
+            continue
+
+        product, error = try_extract_product(url, local=local, archive=archive)
         if product:
             new_products.append(product)
-            state["crawled"].append(url)
+            index.add(product.model_dump(mode="json"))
+            mark_crawled(state, url)
             logger.info(f"  -> Extracted: {product.name} ({product.price}EUR)")
         else:
             new_failed.append(url)
-            state["failed"].append(url)
-            logger.warning(f"  -> Failed to extract")
+            mark_failed(state, url, error)
+            logger.warning(f"  -> Failed to extract ({type(error).__name__})")
 
         # Remove from pending
         state["pending"].remove(url)
@@ -237,10 +541,12 @@ def crawl_pending(
     # Update state
     state["metadata"]["last_crawl_at"] = datetime.now().isoformat()
     save_url_state(state, urls_path)
+    if archive is not None:
+        archive.save()
 
     # Append to products catalog
-    if new_products:
-        append_products(new_products, products_path)
+    if new_products or duplicate_urls:
+        append_products(new_products, products_path, duplicate_urls=duplicate_urls)
 
     return new_products, new_failed
 
@@ -252,7 +558,7 @@ def crawl_pending(
 def load_catalog(path: Path = DEFAULT_PRODUCTS_PATH) -> dict:
     """Load existing product catalog."""
     if path.exists():
-        with open(path, "r", encoding="utf-8") as f:
+        with phase("json_load"), open(path, "r", encoding="utf-8") as f:
             return json.load(f)
     return {
         "metadata": {
@@ -265,20 +571,41 @@ def load_catalog(path: Path = DEFAULT_PRODUCTS_PATH) -> dict:
     }
 
 
-def append_products(new_products: list[Product], path: Path = DEFAULT_PRODUCTS_PATH) -> None:
-    """Append new products to existing catalog (deduplicates by URL)."""
-    catalog = load_catalog(path)
+def append_products(
+    new_products: list[Product],
+    path: Path = DEFAULT_PRODUCTS_PATH,
+    duplicate_urls: list[str] | None = None
+) -> None:
+    """
+    Append new products to existing catalog.
 
-    # Build set of existing URLs for deduplication
-    existing_urls = {p["url"] for p in catalog["products"]}
+    Products already in the catalog (same URL, ref, or name+weight) are
+    merged into the existing record instead of being appended.
+    duplicate_urls are URLs known to belong to existing products; they are
+    added to those products' alt_urls.
+    """
+    catalog = load_catalog(path)
+    index = DedupIndex(catalog["products"])
 
-    # Add only new products
     added = 0
+    merged = 0
     for product in new_products:
-        if product.url not in existing_urls:
-            catalog["products"].append(product.model_dump())
-            existing_urls.add(product.url)
+        data = product.model_dump(mode="json")
+        existing = index.find(data)
+        if existing is None:
+            catalog["products"].append(data)
+            index.add(data)
             added += 1
+        elif data["url"] != existing["url"] and data["url"] not in existing.get("alt_urls", []):
+            merge_products(existing, data)
+            index.add(existing)
+            merged += 1
+
+    for url in duplicate_urls or []:
+        existing = index.find_url(url)
+        if existing is not None:
+            merge_products(existing, {"url": url})
+            index.add(existing)
 
     # Update metadata
     catalog["metadata"]["last_updated_at"] = datetime.now().isoformat()
@@ -286,10 +613,32 @@ def append_products(new_products: list[Product], path: Path = DEFAULT_PRODUCTS_P
 
     # Save
     path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
+    with phase("file_write"), open(path, "w", encoding="utf-8") as f:
         json.dump(catalog, f, ensure_ascii=False, indent=2)
 
-    logger.info(f"Added {added} new products to catalog (total: {len(catalog['products'])})")
+    logger.info(f"Added {added} new products to catalog, merged {merged} duplicates (total: {len(catalog['products'])})")
+
+
+def dedupe_catalog(path: Path = DEFAULT_PRODUCTS_PATH) -> tuple[int, int]:
+    """
+    Merge duplicate products already in the catalog.
+
+    Returns:
+        Tuple of (product count before, product count after)
+    """
+    catalog = load_catalog(path)
+    before = len(catalog["products"])
+    catalog["products"] = dedupe(catalog["products"])
+    after = len(catalog["products"])
+
+    if after != before:
+        catalog["metadata"]["last_updated_at"] = datetime.now().isoformat()
+        catalog["metadata"]["product_count"] = after
+        with phase("file_write"), open(path, "w", encoding="utf-8") as f:
+            json.dump(catalog, f, ensure_ascii=False, indent=2)
+
+    logger.info(f"Deduplicated catalog: {before} -> {after} products")
+    return before, after
 
 
 def save_catalog(products: list[Product], path: str | Path) -> None:
@@ -307,7 +656,7 @@ def save_catalog(products: list[Product], path: str | Path) -> None:
         "products": [p.model_dump() for p in products]
     }
 
-    with open(path, "w", encoding="utf-8") as f:
+    with phase("file_write"), open(path, "w", encoding="utf-8") as f:
         json.dump(catalog, f, ensure_ascii=False, indent=2)
 
     logger.info(f"Saved {len(products)} products to {path}")
@@ -334,7 +683,9 @@ def get_products_missing_fields(
 
 def update_product_fields(
     limit: int | None = None,
-    products_path: Path = DEFAULT_PRODUCTS_PATH
+    products_path: Path = DEFAULT_PRODUCTS_PATH,
+    local: bool = True,
+    archive: PageArchive | None = None
 ) -> tuple[int, int]:
     """
     Re-extract products that are missing new fields (ref, price_per_kg, nutriscore).
@@ -365,19 +716,28 @@ def update_product_fields(
 
     updated = 0
     failed = 0
+    # Fail fast on a missing SDK/key instead of failing every product
+    get_client()
 
     for idx, (product_index, old_product) in enumerate(products_to_update, 1):
         url = old_product["url"]
         logger.info(f"Updating {idx}/{len(products_to_update)}: {old_product['name']}")
 
-        new_product = extract_product(url)
+        # Only the target fields are needed: the LLM is skipped if the page
+        # markup has them all
+        try:
+            fields = fetch_product_fields(url, local=local, archive=archive, needed=fields_to_check)
+            updates = {field: fields[field] for field in fields_to_check if fields.get(field) is not None}
+            new_product = Product.model_validate({**old_product, **updates}) if updates else None
+        except Exception as e:
+            logger.error(f"Failed to extract product from {url}: {e}")
+            new_product = None
 
         if new_product:
             # Merge: keep old data, update with new fields
-            new_data = new_product.model_dump()
-            for field in fields_to_check:
-                if new_data.get(field) is not None:
-                    old_product[field] = new_data[field]
+            new_data = new_product.model_dump(mode="json")
+            for field in updates:
+                old_product[field] = new_data[field]
 
             products[product_index] = old_product
             updated += 1
@@ -388,21 +748,82 @@ def update_product_fields(
 
     # Save updated catalog
     catalog["metadata"]["last_updated_at"] = datetime.now().isoformat()
-    with open(products_path, "w", encoding="utf-8") as f:
+    with phase("file_write"), open(products_path, "w", encoding="utf-8") as f:
         json.dump(catalog, f, ensure_ascii=False, indent=2)
 
+    if archive is not None:
+        archive.save()
+
     logger.info(f"Updated {updated} products, {failed} failed")
     return updated, failed
 
 
+def reextract(
+    archive: PageArchive | None = None,
+    products_path: Path = DEFAULT_PRODUCTS_PATH
+) -> tuple[int, int]:
+    """
+    Rerun local extraction over archived pages and update the catalog.
+
+    Fields the extractors can fill overwrite the catalog values; the rest
+    (e.g. product_type, which comes from the LLM) are kept. No network
+    access.
+
+    Returns:
+        Tuple of (updated count, archived pages with no catalog entry)
+    """
+    if archive is None:
+        archive = PageArchive()
+
+    catalog = load_catalog(products_path)
+    products_by_url = {p["url"]: p for p in catalog["products"]}
+
+    updated = 0
+    orphans = 0
+    for url in archive.urls():
+        product = products_by_url.get(url)
+        if product is None:
+            orphans += 1
+            continue
+
+        page = archive.get(url)
+        fields = extract_local(url, html=page.get("html", ""), markdown=page.get("markdown", ""))
+        if not fields:
+            continue
+        try:
+            validated = Product.model_validate({**product, **fields}).model_dump(mode="json")
+        except Exception as e:
+            logger.warning(f"Re-extracted data for {url} does not validate: {e}")
+            continue
+
+        # Only the fields the extractors filled can change; keys the stored
+        # record lacks (e.g. from older schema versions) are left alone
+        changes = {key: validated[key] for key in fields if product.get(key) != validated[key]}
+        if changes:
+            product.update(changes)
+            updated += 1
+
+    if updated:
+        catalog["metadata"]["last_updated_at"] = datetime.now().isoformat()
+        with phase("file_write"), open(products_path, "w", encoding="utf-8") as f:
+            json.dump(catalog, f, ensure_ascii=False, indent=2)
+
+    logger.info(f"Re-extracted {len(archive)} archived pages: {updated} products updated, {orphans} not in catalog")
+    return updated, orphans
+
+
 # =============================================================================
 # Legacy function for backward compatibility
 # =============================================================================
 
-def crawl_all(limit: int | None = None) -> tuple[list[Product], list[str]]:
+def crawl_all(
+    limit: int | None = None,
+    local: bool = True,
+    archive: PageArchive | None = None
+) -> tuple[list[Product], list[str]]:
     """
     Legacy function: discovers URLs and crawls in one go.
     For new code, use map_urls() + crawl_pending() separately.
     """
     state = map_urls()
-    return crawl_pending(limit=limit)
+    return crawl_pending(limit=limit, local=local, archive=archive)
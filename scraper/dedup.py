@@ -0,0 +1,140 @@
+"""
+Cross-URL product deduplication.
+
+The same Picard product can be listed under several URLs and categories.
+Products are considered duplicates when they share a `ref`, or (when the
+ref of at least one of them is unknown) the same normalized name and
+weight; records with two different refs are never merged. Duplicates are merged
+into the first record seen: its empty fields are filled from the duplicate,
+and the duplicate's categories and URL are kept in `categories` / `alt_urls`.
+
+Works on plain catalog dicts so build_prompt.py can use it without pydantic.
+"""
+import re
+import unicodedata
+
+_URL_REF_RE = re.compile(r"(\d{6})(?:\.html)?/?(?:[?#].*)?$")
+
+
+def ref_from_url(url: str) -> str | None:
+    """Return the product ref embedded in a product URL, if any."""
+    match = _URL_REF_RE.search(url)
+    return match.group(1) if match else None
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase, strip accents and collapse punctuation/whitespace."""
+    text = unicodedata.normalize("NFKD", name or "")
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+def product_keys(product: dict) -> list[str]:
+    """Keys under which a product is indexed (ref and name+weight signature)."""
+    keys = []
+    if product.get("ref"):
+        keys.append(f"ref:{product['ref']}")
+    if product.get("name") and product.get("weight_grams"):
+        keys.append(f"sig:{normalize_name(product['name'])}|{product['weight_grams']}")
+    return keys
+
+
+def merge_products(target: dict, duplicate: dict) -> dict:
+    """Merge a duplicate record into target (in place) and return target."""
+    for key, value in duplicate.items():
+        if key in ("categories", "alt_urls"):
+            continue
+        if target.get(key) is None and value is not None:
+            target[key] = value
+
+    categories = target.get("categories") or [target["category"]]
+    for category in [duplicate.get("category"), *(duplicate.get("categories") or [])]:
+        if category and category not in categories:
+            categories.append(category)
+    target["categories"] = categories
+
+    alt_urls = target.get("alt_urls") or []
+    for url in [duplicate.get("url"), *(duplicate.get("alt_urls") or [])]:
+        if url and url != target.get("url") and url not in alt_urls:
+            alt_urls.append(url)
+    target["alt_urls"] = alt_urls
+
+    return target
+
+
+def refs_conflict(a: dict, b: dict) -> bool:
+    """Whether two records carry different refs (and so are different products)."""
+    return bool(a.get("ref")) and bool(b.get("ref")) and a["ref"] != b["ref"]
+
+
+class DedupIndex:
+    """Index of catalog products by ref and name+weight signature."""
+
+    def __init__(self, products: list[dict] | None = None):
+        self._refs: dict[str, dict] = {}
+        self._signatures: dict[str, list[dict]] = {}
+        self._urls: dict[str, dict] = {}
+        for product in products or []:
+            self.add(product)
+
+    def add(self, product: dict) -> None:
+        """Index a product (first product wins for each ref and URL)."""
+        for key in product_keys(product):
+            if key.startswith("ref:"):
+                self._refs.setdefault(key, product)
+            else:
+                candidates = self._signatures.setdefault(key, [])
+                if not any(c is product for c in candidates):
+                    candidates.append(product)
+        for url in [product.get("url"), *(product.get("alt_urls") or [])]:
+            if url:
+                self._urls.setdefault(url, product)
+
+    def find(self, product: dict) -> dict | None:
+        """
+        Return the indexed product this one duplicates, if any.
+
+        The name+weight signature only matches when the refs do not
+        conflict, i.e. at least one side has no ref. A ref-less product
+        whose signature matches several products is left unmatched rather
+        than merged into an arbitrary one.
+        """
+        if product.get("url") in self._urls:
+            return self._urls[product["url"]]
+        for key in product_keys(product):
+            if key.startswith("ref:"):
+                if key in self._refs:
+                    return self._refs[key]
+                continue
+            candidates = [c for c in self._signatures.get(key, []) if not refs_conflict(c, product)]
+            if len(candidates) == 1:
+                return candidates[0]
+        return None
+
+    def find_url(self, url: str) -> dict | None:
+        """Return the indexed product for a URL, matching on the URL's ref."""
+        if url in self._urls:
+            return self._urls[url]
+        ref = ref_from_url(url)
+        return self._refs.get(f"ref:{ref}") if ref else None
+
+
+def dedupe(products: list[dict]) -> list[dict]:
+    """
+    Merge duplicate products.
+
+    Returns:
+        New list with one (merged) record per product, in first-seen order
+    """
+    index = DedupIndex()
+    result = []
+    for product in products:
+        existing = index.find(product)
+        if existing is None:
+            product = dict(product)
+            result.append(product)
+            index.add(product)
+        else:
+            merge_products(existing, product)
+            index.add(existing)
+    return result
@@ -0,0 +1,370 @@
+"""
+Deterministic product extraction from raw page content.
+
+Parses JSON-LD, microdata and well-known text patterns ("Ref.: 060489",
+"€24,97/kg", ...) into `Product` fields without calling an LLM. The crawler
+only falls back to Firecrawl's LLM `extract` format when these extractors
+leave a required field (REQUIRED_FIELDS) empty.
+
+Extractors are plain functions `(url, html, markdown) -> dict` registered in
+EXTRACTORS; earlier extractors win when several fill the same field.
+"""
+import html as html_lib
+import json
+import re
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Callable
+
+from .dedup import ref_from_url
+from .schemas import CATALOG_FIELDS, NutriScore, Product
+
+Extractor = Callable[[str, str, str], dict]
+
+# Fields the extractors try to fill (url and dedup fields are set by the crawler)
+PRODUCT_FIELDS = [name for name in Product.model_fields if name not in CATALOG_FIELDS]
+
+# Fields a product cannot be validated without; only these make the crawler
+# fall back to the LLM (nullable and default-False fields do not)
+REQUIRED_FIELDS = [name for name in PRODUCT_FIELDS if Product.model_fields[name].is_required()]
+
+# Extensions recognized by coverage_report()
+HTML_SUFFIXES = {".html", ".htm"}
+MARKDOWN_SUFFIXES = {".md", ".markdown", ".txt"}
+
+
+# =============================================================================
+# Value Parsing Helpers
+# =============================================================================
+
+def parse_price(value) -> float | None:
+    """Parse a price like 12.99, '12,99', '12,99 €' or '€12.99'."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = re.search(r"\d+(?:[.,]\d+)?", str(value).replace("\u00a0", " "))
+    if not match:
+        return None
+    return float(match.group(0).replace(",", "."))
+
+
+def parse_weight_grams(value, unit: str | None = None) -> int | None:
+    """Parse a weight ('500 g', '1,2 kg', or a number plus unit) into grams."""
+    if value is None:
+        return None
+    if unit is None:
+        match = re.search(r"(\d+(?:[.,]\d+)?)\s*(kg|g)\b", str(value), re.IGNORECASE)
+        if not match:
+            return None
+        value, unit = match.group(1), match.group(2)
+    amount = parse_price(value)
+    if amount is None:
+        return None
+    unit = unit.lower()
+    if unit in ("kg", "kgm", "kilogram"):
+        amount *= 1000
+    elif unit not in ("g", "grm", "gram"):
+        return None
+    return int(round(amount))
+
+
+def parse_nutriscore(value) -> str | None:
+    """Normalize a NutriScore value to one of A-E."""
+    if value is None:
+        return None
+    letter = str(value).strip().upper()[-1:]
+    return letter if letter in NutriScore.__members__ else None
+
+
+def _merge(target: dict, values: dict) -> None:
+    """Copy values into target, keeping fields that are already filled."""
+    for key, value in values.items():
+        if value is not None and target.get(key) is None:
+            target[key] = value
+
+
+# =============================================================================
+# JSON-LD
+# =============================================================================
+
+_JSON_LD_RE = re.compile(
+    r'<script[^>]+type=["\']application/ld\+json["\'][^>]*>(.*?)</script>',
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+def _json_ld_nodes(html: str) -> list[dict]:
+    """Return all JSON-LD objects in the page, flattening lists and @graph."""
+    nodes = []
+    for block in _JSON_LD_RE.findall(html):
+        try:
+            data = json.loads(block.strip())
+        except json.JSONDecodeError:
+            continue
+        stack = data if isinstance(data, list) else [data]
+        while stack:
+            node = stack.pop(0)
+            if isinstance(node, list):
+                stack.extend(node)
+            elif isinstance(node, dict):
+                nodes.append(node)
+                if isinstance(node.get("@graph"), list):
+                    stack.extend(node["@graph"])
+    return nodes
+
+
+def _has_type(node: dict, type_name: str) -> bool:
+    types = node.get("@type")
+    types = types if isinstance(types, list) else [types]
+    return type_name in types
+
+
+def extract_json_ld(url: str, html: str, markdown: str) -> dict:
+    """Extract fields from schema.org Product and BreadcrumbList JSON-LD."""
+    fields = {}
+    for node in _json_ld_nodes(html):
+        if _has_type(node, "Product"):
+            offers = node.get("offers")
+            if isinstance(offers, list):
+                offers = offers[0] if offers else None
+            image = node.get("image")
+            if isinstance(image, list):
+                image = image[0] if image else None
+            if isinstance(image, dict):
+                image = image.get("url")
+            weight = node.get("weight")
+            if isinstance(weight, dict):
+                weight = parse_weight_grams(weight.get("value"), weight.get("unitCode") or weight.get("unitText") or "g")
+            else:
+                weight = parse_weight_grams(weight)
+
+            _merge(fields, {
+                "name": node.get("name"),
+                "ref": node.get("sku") or node.get("productID") or node.get("mpn"),
+                "price": parse_price(offers.get("price")) if isinstance(offers, dict) else None,
+                "image_url": image,
+                "weight_grams": weight,
+                "nutriscore": parse_nutriscore(node.get("nutriScore")),
+            })
+        elif _has_type(node, "BreadcrumbList"):
+            names = []
+            for item in node.get("itemListElement") or []:
+                if not isinstance(item, dict):
+                    continue
+                name = item.get("name")
+                if name is None and isinstance(item.get("item"), dict):
+                    name = item["item"].get("name")
+                if name:
+                    names.append(str(name).strip())
+            # Drop the home crumb and the trailing product crumb
+            if names and names[0].lower() in ("accueil", "home", "picard"):
+                names = names[1:]
+            if len(names) > 1 and fields.get("name") and names[-1] == fields["name"]:
+                names = names[:-1]
+            if names:
+                _merge(fields, {"category": " > ".join(names)})
+    return fields
+
+
+# =============================================================================
+# Microdata
+# =============================================================================
+
+class _MicrodataParser(HTMLParser):
+    """Collect the first value of each itemprop attribute in the page."""
+
+    def __init__(self):
+        super().__init__()
+        self.props: dict[str, str] = {}
+        self._open: list[tuple[str, str]] = []  # (tag, itemprop) awaiting text
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        prop = attrs.get("itemprop")
+        if not prop or prop in self.props:
+            return
+        value = attrs.get("content") or attrs.get("src") or attrs.get("href")
+        if value:
+            self.props[prop] = value
+        else:
+            self._open.append((tag, prop))
+
+    def handle_endtag(self, tag):
+        if self._open and self._open[-1][0] == tag:
+            self._open.pop()
+
+    def handle_data(self, data):
+        if self._open and data.strip():
+            _, prop = self._open.pop()
+            self.props.setdefault(prop, data.strip())
+
+
+def extract_microdata(url: str, html: str, markdown: str) -> dict:
+    """Extract fields from schema.org microdata (itemprop attributes)."""
+    if "itemprop" not in html:
+        return {}
+    parser = _MicrodataParser()
+    try:
+        parser.feed(html)
+    except Exception:
+        return {}
+    props = parser.props
+    return {
+        "name": props.get("name"),
+        "ref": props.get("sku") or props.get("productID"),
+        "price": parse_price(props.get("price")),
+        "image_url": props.get("image"),
+        "weight_grams": parse_weight_grams(props.get("weight")),
+    }
+
+
+# =============================================================================
+# Text Patterns
+# =============================================================================
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_REF_RE = re.compile(r"R[ée]f(?:[ée]rence)?\.?\s*:?\s*(\d{4,})", re.IGNORECASE)
+_PRICE_PER_KG_RE = re.compile(
+    r"(?:(\d+(?:[.,]\d{1,2})?)\s*€|€\s*(\d+(?:[.,]\d{1,2})?))\s*/\s*kg",
+    re.IGNORECASE,
+)
+_WEIGHT_RE = re.compile(
+    r"(?:poids(?:\s+net)?|contenance)\s*:?\s*(\d+(?:[.,]\d+)?)\s*(kg|g)\b",
+    re.IGNORECASE,
+)
+_SERVINGS_RE = re.compile(r"(\d+)\s*(?:portions?|parts?|personnes?)\b", re.IGNORECASE)
+_NUTRISCORE_RE = re.compile(r"nutri[-_\s]?score[-_\s]*:?\s*([A-E])\b", re.IGNORECASE)
+
+
+def extract_patterns(url: str, html: str, markdown: str) -> dict:
+    """Extract fields from visible text patterns and the URL."""
+    text = markdown or html_lib.unescape(_TAG_RE.sub(" ", html))
+    text = text.replace("\u00a0", " ")
+    fields = {}
+
+    match = _REF_RE.search(text)
+    fields["ref"] = match.group(1) if match else ref_from_url(url)
+
+    match = _PRICE_PER_KG_RE.search(text)
+    if match:
+        fields["price_per_kg"] = parse_price(match.group(1) or match.group(2))
+
+    match = _WEIGHT_RE.search(text)
+    if match:
+        fields["weight_grams"] = parse_weight_grams(match.group(1), match.group(2))
+
+    match = _SERVINGS_RE.search(text)
+    if match:
+        fields["servings"] = int(match.group(1))
+
+    # Badges are often images (e.g. nutriscore-b.svg), so also look at raw HTML
+    match = _NUTRISCORE_RE.search(text) or _NUTRISCORE_RE.search(html)
+    if match:
+        fields["nutriscore"] = match.group(1).upper()
+
+    return fields
+
+
+# =============================================================================
+# Product Type
+# =============================================================================
+
+# Slug keywords used to guess the type of a product from its URL. The guess
+# is often wrong (tarte-aux-poireaux is not a dessert), so it is only used
+# to plan crawls (scheduler) and as a last resort when the LLM returns no
+# type; it is never an extracted field. Checked in order, so composite
+# dishes (ready_meal) win over ingredients.
+TYPE_KEYWORDS = [
+    ("ready_meal", ["gratin", "gratins", "lasagnes", "risotto", "risottos", "parmentier", "hachis",
+                    "paella", "paellas", "couscous", "curry", "currys", "pizza", "pizzas", "quiche",
+                    "quiches", "tajine", "tajines", "blanquette", "bourguignon", "plat", "plats",
+                    "cassoulet", "lasagne", "moussaka", "nems", "tagliatelles", "raviolis"]),
+    ("breakfast", ["croissant", "croissants", "viennoiserie", "viennoiseries", "brioche",
+                   "pain-au-chocolat", "pains-au-chocolat", "crepe", "crepes", "pancakes", "gaufre", "gaufres"]),
+    ("dessert", ["glace", "glaces", "sorbet", "sorbets", "tarte", "tartelettes", "gateau", "macarons",
+                 "dessert", "mousse", "buche", "fondant", "cookies", "eclairs", "profiteroles", "entremets"]),
+    ("appetizer", ["aperitif", "aperitifs", "mini", "minis", "feuilletes", "verrines", "toasts",
+                   "gougeres", "samoussas", "accras", "bouchees", "petits-fours"]),
+    ("bread", ["pain", "pains", "baguette", "baguettes", "focaccia", "burger-buns"]),
+    ("fish", ["saumon", "cabillaud", "thon", "crevettes", "poisson", "poissons", "colin", "lieu",
+              "moules", "saint-jacques", "gambas", "calamars", "sole", "truite", "crabe", "homard"]),
+    ("meat", ["boeuf", "poulet", "dinde", "porc", "agneau", "veau", "canard", "volaille",
+              "saucisses", "steak", "steaks", "jambon", "chapon", "pintade", "magret"]),
+    ("fruit", ["fraises", "framboises", "mangue", "fruits", "myrtilles", "ananas", "cerises", "abricots"]),
+    ("vegetable", ["legumes", "haricots", "epinards", "brocolis", "carottes", "petits-pois", "poelee",
+                   "ratatouille", "champignons", "pommes-de-terre", "frites", "courgettes", "poireaux"]),
+]
+
+
+def guess_product_type(url: str) -> str | None:
+    """Guess the product_type of a product URL from slug keywords."""
+    slug = url.rstrip("/").rsplit("/", 1)[-1].split(".")[0].lower()
+    padded = f"-{slug}-"
+    for product_type, keywords in TYPE_KEYWORDS:
+        if any(f"-{kw}-" in padded for kw in keywords):
+            return product_type
+    return None
+
+
+# =============================================================================
+# Registry
+# =============================================================================
+
+EXTRACTORS: list[Extractor] = [extract_json_ld, extract_microdata, extract_patterns]
+
+
+def register_extractor(extractor: Extractor, first: bool = False) -> None:
+    """Add a custom extractor (before the built-in ones if first=True)."""
+    if first:
+        EXTRACTORS.insert(0, extractor)
+    else:
+        EXTRACTORS.append(extractor)
+
+
+def extract_local(url: str, html: str = "", markdown: str = "") -> dict:
+    """Run all registered extractors and merge their results."""
+    fields = {}
+    for extractor in EXTRACTORS:
+        _merge(fields, extractor(url, html or "", markdown or ""))
+    return {key: value for key, value in fields.items() if key in PRODUCT_FIELDS}
+
+
+def missing_fields(fields: dict, names: list[str] | None = None) -> list[str]:
+    """Return the fields of names (default: all PRODUCT_FIELDS) left empty."""
+    return [name for name in names or PRODUCT_FIELDS if fields.get(name) is None]
+
+
+# =============================================================================
+# Coverage Report
+# =============================================================================
+
+def coverage_report(pages_dir: str | Path) -> dict:
+    """
+    Run local extraction over a corpus of saved product pages.
+
+    Each file in pages_dir is one page (.html/.htm as HTML, .md/.txt as
+    markdown); the file stem is used as the URL.
+
+    Returns:
+        Dict with the page count and, per field, how many pages filled it
+    """
+    pages_dir = Path(pages_dir)
+    counts = {name: 0 for name in PRODUCT_FIELDS}
+    pages = 0
+
+    for path in sorted(pages_dir.iterdir()):
+        suffix = path.suffix.lower()
+        if suffix not in HTML_SUFFIXES | MARKDOWN_SUFFIXES:
+            continue
+        content = path.read_text(encoding="utf-8", errors="replace")
+        if suffix in HTML_SUFFIXES:
+            fields = extract_local(path.stem, html=content)
+        else:
+            fields = extract_local(path.stem, markdown=content)
+        pages += 1
+        for name in PRODUCT_FIELDS:
+            if fields.get(name) is not None:
+                counts[name] += 1
+
+    return {"pages": pages, "fields": counts}
@@ -0,0 +1,309 @@
+"""
+Staged crawl pipeline: fetch -> validate -> persist.
+
+An alternative to crawl_pending() for large pending sets. Each stage runs as
+its own asyncio task, connected by bounded queues:
+
+    producer --urls--> fetch workers (N, concurrent) --fields--> validator
+             --results--> writer (single, micro-batched persistence)
+
+- Fetches run concurrently in worker threads (the Firecrawl SDK is sync).
+- Validation (Product.model_validate) runs in its own stage, in a thread,
+  so a large page never stalls the queues.
+- A single writer appends results to a journal (one JSON line per URL)
+  every `batch_size` results or `flush_interval` seconds, in a thread so
+  disk I/O never blocks the event loop. Each flush costs O(batch), not
+  O(catalog): urls.json and products.json are only rewritten when the
+  journal is compacted into them at the end of the run. A journal left by
+  an interrupted run is compacted before the next pipelined run starts.
+- Queues are bounded, so memory stays flat however many URLs are pending:
+  the producer only reads ahead a few URLs, and extracted products and
+  failures are only counted once they are written (the failure ledger in
+  urls.json has the details).
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+
+from .archive import PageArchive
+from .crawler import (
+    DEFAULT_JOURNAL_PATH,
+    DEFAULT_PRODUCTS_PATH,
+    DEFAULT_URLS_PATH,
+    EmptyExtraction,
+    UnexpectedResponse,
+    append_products,
+    failure_info,
+    fetch_product_fields,
+    get_client,
+    load_catalog,
+    load_url_state,
+    mark_crawled,
+    mark_failed,
+    save_url_state,
+)
+from .dedup import DedupIndex
+from .schemas import Product
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+DEFAULT_BATCH_SIZE = 25
+DEFAULT_FLUSH_INTERVAL = 10.0  # seconds
+
+_DONE = object()  # end-of-stream marker passed between stages
+
+
+class _Writer:
+    """Single writer: buffers results and appends them to the journal in micro-batches."""
+
+    def __init__(self, journal_path: Path):
+        self.journal_path = journal_path
+        self.entries: list[dict] = []
+        self.extracted_count = 0
+        self.failed_count = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, kind: str, url: str, payload: Product | Exception | None) -> None:
+        """Buffer a result; payload is the Product, or the error for failures."""
+        entry = {"kind": kind, "url": url, "at": datetime.now().isoformat()}
+        if kind == "product":
+            entry["product"] = payload.model_dump(mode="json")
+            self.extracted_count += 1
+        elif kind == "failed":
+            entry.update(failure_info(payload))
+            self.failed_count += 1
+        self.entries.append(entry)
+
+    def flush(self) -> None:
+        """Append buffered results to the journal (runs in a worker thread)."""
+        if not self.entries:
+            return
+        self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            for entry in self.entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.entries = []
+
+
+def compact_journal(
+    journal_path: Path = DEFAULT_JOURNAL_PATH,
+    urls_path: Path = DEFAULT_URLS_PATH,
+    products_path: Path = DEFAULT_PRODUCTS_PATH,
+    archive: PageArchive | None = None
+) -> int:
+    """
+    Apply a crawl journal to the URL state and catalog, then delete it.
+
+    Loads and rewrites urls.json and products.json once, whatever the number
+    of journal entries. A truncated last line (interrupted write) is skipped.
+
+    Returns:
+        Number of journal entries applied
+    """
+    if not journal_path.exists():
+        return 0
+
+    entries = []
+    with open(journal_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                logger.warning(f"Skipping unreadable journal line in {journal_path}")
+
+    state = load_url_state(urls_path)
+    done = {entry["url"] for entry in entries}
+    state["pending"] = [url for url in state["pending"] if url not in done]
+    products, duplicates = [], []
+    for entry in entries:
+        at = datetime.fromisoformat(entry["at"])
+        if entry["kind"] == "failed":
+            mark_failed(state, entry["url"], {"error_class": entry["error_class"], "error": entry["error"]}, now=at)
+            continue
+        mark_crawled(state, entry["url"], now=at)
+        if entry["kind"] == "product":
+            products.append(Product.model_validate(entry["product"]))
+        else:
+            duplicates.append(entry["url"])
+    state["metadata"]["last_crawl_at"] = datetime.now().isoformat()
+    save_url_state(state, urls_path)
+
+    if products or duplicates:
+        append_products(products, products_path, duplicate_urls=duplicates)
+    if archive is not None:
+        archive.save()
+
+    journal_path.unlink()
+    logger.info(f"Compacted {len(entries)} journal entries into {urls_path} and {products_path}")
+    return len(entries)
+
+
+async def _produce(urls: list[str], index: DedupIndex, fetch_queue: asyncio.Queue,
+                   write_queue: asyncio.Queue, workers: int) -> None:
+    """Feed URLs to the fetch workers, short-circuiting known duplicates."""
+    for url in urls:
+        known = index.find_url(url)
+        if known is not None:
+            logger.info(f"Duplicate of {known['url']} (ref {known.get('ref')}), skipped: {url}")
+            await write_queue.put(("duplicate", url, None))
+            continue
+        await fetch_queue.put(url)
+    for _ in range(workers):
+        await fetch_queue.put(_DONE)
+
+
+async def _fetch(fetch_queue: asyncio.Queue, validate_queue: asyncio.Queue,
+                 local: bool, archive: PageArchive | None) -> None:
+    """Fetch worker: network I/O only, in a thread."""
+    while (url := await fetch_queue.get()) is not _DONE:
+        error = None
+        try:
+            fields = await asyncio.to_thread(fetch_product_fields, url, local, archive)
+        except UnexpectedResponse as e:
+            logger.warning(str(e))
+            fields, error = {}, e
+        except Exception as e:
+            logger.error(f"Failed to extract product from {url}: {e}")
+            fields, error = {}, e
+        await validate_queue.put((url, fields, error))
+
+
+async def _fetch_stage(fetch_queue: asyncio.Queue, validate_queue: asyncio.Queue,
+                       local: bool, archive: PageArchive | None, workers: int) -> None:
+    """Run the fetch workers concurrently, then close the validate queue."""
+    await asyncio.gather(*(_fetch(fetch_queue, validate_queue, local, archive) for _ in range(workers)))
+    await validate_queue.put(_DONE)
+
+
+async def _validate(validate_queue: asyncio.Queue, write_queue: asyncio.Queue, index: DedupIndex) -> None:
+    """Validation stage: turn raw fields into Product models."""
+    while (item := await validate_queue.get()) is not _DONE:
+        url, fields, error = item
+        product = None
+        if fields:
+            try:
+                product = await asyncio.to_thread(Product.model_validate, fields)
+            except Exception as e:
+                logger.error(f"Failed to validate product from {url}: {e}")
+                error = e
+        elif error is None:
+            error = EmptyExtraction(f"No product data extracted from {url}")
+
+        if product is not None:
+            index.add(product.model_dump(mode="json"))
+            logger.info(f"Extracted: {product.name} ({product.price}EUR)")
+            await write_queue.put(("product", url, product))
+        else:
+            logger.warning(f"Failed to extract ({type(error).__name__}): {url}")
+            await write_queue.put(("failed", url, error))
+    await write_queue.put(_DONE)
+
+
+async def _write(write_queue: asyncio.Queue, writer: _Writer, batch_size: int,
+                 flush_interval: float, total: int) -> None:
+    """Writer stage: journal every batch_size results or flush_interval seconds."""
+    processed = 0
+    deadline = time.monotonic() + flush_interval
+    while True:
+        timeout = max(deadline - time.monotonic(), 0)
+        try:
+            item = await asyncio.wait_for(write_queue.get(), timeout)
+        except asyncio.TimeoutError:
+            item = None
+
+        if item is _DONE:
+            break
+        if item is not None:
+            writer.add(*item)
+            processed += 1
+
+        if len(writer) >= batch_size or time.monotonic() >= deadline:
+            if len(writer):
+                await asyncio.to_thread(writer.flush)
+                logger.info(f"Journaled batch ({processed}/{total} processed)")
+            deadline = time.monotonic() + flush_interval
+
+    await asyncio.to_thread(writer.flush)
+
+
+async def crawl_pending_async(
+    limit: int | None = None,
+    urls_path: Path = DEFAULT_URLS_PATH,
+    products_path: Path = DEFAULT_PRODUCTS_PATH,
+    local: bool = True,
+    archive: PageArchive | None = None,
+    workers: int = DEFAULT_WORKERS,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+    journal_path: Path = DEFAULT_JOURNAL_PATH
+) -> tuple[int, int]:
+    """
+    Crawl pending URLs through the staged pipeline.
+
+    Args:
+        limit: Max number of URLs to crawl in this run
+        urls_path: Path to URL state file
+        products_path: Path to products catalog file
+        local: Try local HTML/JSON-LD extraction before the LLM
+        archive: Optional archive to store each fetched raw page in
+        workers: Number of concurrent fetches
+        batch_size: Journal results after this many...
+        flush_interval: ...or after this many seconds, whichever comes first
+        journal_path: Append-only journal, compacted into the state and
+            catalog files at the end of the run
+
+    Returns:
+        Tuple of (number of extracted products, number of failed URLs)
+    """
+    # Results journaled by an interrupted run
+    if compact_journal(journal_path, urls_path, products_path, archive):
+        logger.info("Recovered results from an interrupted pipelined run")
+
+    state = load_url_state(urls_path)
+    pending = state["pending"]
+    if not pending:
+        logger.info("No pending URLs to crawl. Run with --map first.")
+        return 0, 0
+
+    urls = pending[:limit] if limit else list(pending)
+    del state, pending
+    logger.info(f"Crawling {len(urls)} URLs with {workers} workers")
+
+    # Fail fast on a missing SDK/key, and avoid racing the lazy init
+    get_client()
+
+    index = DedupIndex(load_catalog(products_path)["products"])
+    writer = _Writer(journal_path)
+
+    fetch_queue = asyncio.Queue(maxsize=workers * 2)
+    validate_queue = asyncio.Queue(maxsize=workers * 2)
+    write_queue = asyncio.Queue(maxsize=batch_size * 2)
+
+    # If any stage raises, gather propagates it and asyncio.run() cancels
+    # the others instead of leaving them blocked on a full queue
+    try:
+        await asyncio.gather(
+            _produce(urls, index, fetch_queue, write_queue, workers),
+            _fetch_stage(fetch_queue, validate_queue, local, archive, workers),
+            _validate(validate_queue, write_queue, index),
+            _write(write_queue, writer, batch_size, flush_interval, len(urls)),
+        )
+    finally:
+        # Also on errors/Ctrl-C: whatever reached the journal is kept
+        await asyncio.to_thread(compact_journal, journal_path, urls_path, products_path, archive)
+
+    return writer.extracted_count, writer.failed_count
+
+
+def crawl_pipelined(limit: int | None = None, **kwargs) -> tuple[int, int]:
+    """Synchronous wrapper around crawl_pending_async()."""
+    return asyncio.run(crawl_pending_async(limit=limit, **kwargs))
@@ -0,0 +1,149 @@
+"""
+Built-in profiling for the CLI entry points (--profile).
+
+When enabled, a run records:
+    cpu.prof / cpu.txt   cProfile stats (binary for snakeviz/pstats, and the
+                         top functions by cumulative time as text)
+    memory.txt           tracemalloc peak and the top allocation sites in a
+                         snapshot taken near the peak
+    phases.json          wall time and call count per phase (json_load,
+                         filtering, serialization, file_write, network, ...)
+
+Code marks phases with `with phase("name"):`; this is a no-op unless
+profiling is active, so instrumentation can stay in place.
+"""
+import cProfile
+import io
+import json
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+DEFAULT_REPORT_DIR = Path("profiles")
+
+# Take a new snapshot only when traced memory grew by this factor since the
+# last one (snapshots are expensive)
+_SNAPSHOT_GROWTH = 1.1
+
+
+class Profiler:
+    """Collects CPU, memory and per-phase timing for one run."""
+
+    def __init__(self):
+        self.cpu = cProfile.Profile()
+        self.phases: dict[str, dict] = {}
+        self.snapshot = None
+        self.snapshot_size = 0
+        self.started = None
+        self.elapsed = 0.0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        tracemalloc.start()
+        self.started = time.perf_counter()
+        self.cpu.enable()
+
+    def stop(self) -> None:
+        self.cpu.disable()
+        self.elapsed = time.perf_counter() - self.started
+        self._maybe_snapshot()
+        self.peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    def record(self, name: str, seconds: float) -> None:
+        with self._lock:
+            entry = self.phases.setdefault(name, {"seconds": 0.0, "calls": 0})
+            entry["seconds"] += seconds
+            entry["calls"] += 1
+        self._maybe_snapshot()
+
+    def _maybe_snapshot(self) -> None:
+        current = tracemalloc.get_traced_memory()[0]
+        if current > self.snapshot_size * _SNAPSHOT_GROWTH:
+            with self._lock:
+                self.snapshot = tracemalloc.take_snapshot()
+                self.snapshot_size = current
+
+    def write_report(self, report_dir: Path, label: str) -> Path:
+        """Write the report files and return the directory."""
+        report_dir.mkdir(parents=True, exist_ok=True)
+
+        self.cpu.dump_stats(report_dir / "cpu.prof")
+        out = io.StringIO()
+        pstats.Stats(self.cpu, stream=out).sort_stats("cumulative").print_stats(40)
+        (report_dir / "cpu.txt").write_text(out.getvalue(), encoding="utf-8")
+
+        lines = [
+            f"Peak traced memory: {self.peak / 1024 / 1024:.1f} MB",
+            f"Snapshot at: {self.snapshot_size / 1024 / 1024:.1f} MB",
+            "",
+            "Top allocation sites:",
+        ]
+        if self.snapshot is not None:
+            for stat in self.snapshot.statistics("lineno")[:25]:
+                lines.append(f"  {stat}")
+        (report_dir / "memory.txt").write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+        phases = {
+            "label": label,
+            "created_at": datetime.now().isoformat(),
+            "total_seconds": round(self.elapsed, 4),
+            "peak_memory_bytes": self.peak,
+            # Phases may nest or run in worker threads, so they need not sum to the total
+            "phases": {
+                name: {"seconds": round(entry["seconds"], 4), "calls": entry["calls"]}
+                for name, entry in sorted(self.phases.items(), key=lambda item: -item[1]["seconds"])
+            },
+        }
+        with open(report_dir / "phases.json", "w", encoding="utf-8") as f:
+            json.dump(phases, f, indent=2)
+
+        return report_dir
+
+
+_active: Profiler | None = None
+
+
+@contextmanager
+def phase(name: str):
+    """Time a block as the named phase (no-op unless profiling is active)."""
+    profiler = _active
+    if profiler is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.record(name, time.perf_counter() - start)
+
+
+@contextmanager
+def profiled(report_dir: str | Path | None, label: str):
+    """
+    Profile the enclosed block and write a report.
+
+    report_dir None disables profiling. The report goes to a timestamped
+    subdirectory of report_dir, e.g. profiles/build_prompt-20250101-120000.
+    """
+    global _active
+    if report_dir is None:
+        yield None
+        return
+
+    target = Path(report_dir) / f"{label}-{datetime.now():%Y%m%d-%H%M%S}"
+    profiler = Profiler()
+    _active = profiler
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        _active = None
+        profiler.write_report(target, label)
+        print(f"\nProfile report: {target} ({profiler.elapsed:.2f}s, peak {profiler.peak / 1024 / 1024:.1f} MB)")
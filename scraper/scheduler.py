@@ -0,0 +1,395 @@
+"""
+Credit-budgeted crawl scheduler.
+
+crawl_pending() takes pending URLs in whatever order mapping produced, so a
+capped run yields an arbitrary catalog. This module orders pending URLs (new
+products) and refresh work (stale crawled products) by priority, and stops
+before a hard credit or request budget would be exceeded.
+
+Each candidate gets a score from five weighted components in [0, 1]:
+    new        new products first (pending URLs score 1, refreshes 0)
+    coverage   favour top-level categories with few catalog products; a
+               refresh uses the product's category/categories, a pending
+               URL a category named in its path or, failing that, the
+               category most products of its guessed type are listed in
+    balance    favour product types under-represented in the catalog; the
+               type of a pending URL is guessed from its slug
+    staleness  how long ago a crawled product was last fetched
+    failures   penalty growing with previous failures of the URL (from the
+               failure ledger, see crawler.record_failure)
+
+Category and type counts are updated as URLs are picked, so a run stays
+spread out instead of filling the first thin category it finds.
+"""
+import heapq
+import json
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from . import crawler
+from .archive import PageArchive
+from .crawler import (
+    DEFAULT_PRODUCTS_PATH,
+    DEFAULT_URLS_PATH,
+    append_products,
+    failure_attempts,
+    load_catalog,
+    load_url_state,
+    mark_crawled,
+    mark_failed,
+    record_failure,
+    save_url_state,
+    try_extract_product,
+)
+from .dedup import DedupIndex, normalize_name
+from .extractors import guess_product_type
+from .schemas import ProductType
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WEIGHTS = {"new": 1.0, "coverage": 1.0, "balance": 1.0, "staleness": 0.5, "failures": 1.0}
+
+# Firecrawl credits per call (plain scrape vs. LLM extract format); adjust
+# if the plan's pricing differs
+CREDITS_PER_SCRAPE = 1
+CREDITS_PER_EXTRACT = 5
+
+# =============================================================================
+# Budget
+# =============================================================================
+
+class CreditMeter:
+    """
+    Extraction client wrapper that counts Firecrawl credits and requests.
+
+    Installed with metered() so every fetch in the crawler is counted.
+    """
+
+    def __init__(self, client, max_credits: int | None = None, max_requests: int | None = None):
+        self.client = client
+        self.max_credits = max_credits
+        self.max_requests = max_requests
+        self.credits = 0
+        self.requests = 0
+
+    def scrape_url(self, url: str, **kwargs):
+        self.requests += 1
+        self.credits += CREDITS_PER_EXTRACT if "extract" in kwargs.get("formats", []) else CREDITS_PER_SCRAPE
+        return crawler._scrape(self.client, url, **kwargs)
+
+    def can_afford(self, credits: int, requests: int) -> bool:
+        """Whether a unit of work of the given worst-case cost fits the budget."""
+        if self.max_credits is not None and self.credits + credits > self.max_credits:
+            return False
+        if self.max_requests is not None and self.requests + requests > self.max_requests:
+            return False
+        return True
+
+
+def worst_case_cost(local: bool) -> tuple[int, int]:
+    """Max (credits, requests) one URL can cost with the given extraction mode."""
+    if local:
+        return CREDITS_PER_SCRAPE + CREDITS_PER_EXTRACT, 2
+    return CREDITS_PER_EXTRACT, 1
+
+
+@contextmanager
+def metered(max_credits: int | None = None, max_requests: int | None = None):
+    """Temporarily route all crawler fetches through a CreditMeter."""
+    previous = crawler._client
+    meter = CreditMeter(crawler.get_client(), max_credits, max_requests)
+    crawler.set_client(meter)
+    try:
+        yield meter
+    finally:
+        crawler.set_client(previous)
+
+
+# =============================================================================
+# Planning
+# =============================================================================
+
+def _age_days(timestamp: str | None, now: datetime) -> float | None:
+    if not timestamp:
+        return None
+    return (now - datetime.fromisoformat(timestamp)).total_seconds() / 86400
+
+
+def top_category(category: str | None) -> str | None:
+    """Normalized top-level category ("Desserts > Glaces" -> "desserts")."""
+    if not category:
+        return None
+    return normalize_name(category.split(">")[0]) or None
+
+
+def product_categories(product: dict) -> set[str]:
+    """Top-level categories a catalog product is listed under."""
+    names = [product.get("category"), *(product.get("categories") or [])]
+    return {top for top in map(top_category, names) if top}
+
+
+def pending_category(url: str, type_categories: dict[str, str], known: set[str]) -> str | None:
+    """
+    Top-level category of a pending URL, before it is crawled.
+
+    Uses a path segment naming a known category if there is one (listing
+    URLs, e.g. /desserts/...), else the category most catalog products of
+    the type guessed from the slug are listed under.
+    """
+    for segment in url.split("://", 1)[-1].split("/")[1:-1]:
+        name = normalize_name(segment)
+        if name in known:
+            return name
+    return type_categories.get(guess_product_type(url))
+
+
+def plan_crawl(
+    state: dict,
+    catalog: dict,
+    refresh_after_days: float | None = None,
+    weights: dict | None = None,
+    now: datetime | None = None
+) -> list[dict]:
+    """
+    Order pending URLs and stale crawled products by priority.
+
+    Args:
+        state: URL state (see load_url_state)
+        catalog: Product catalog (see load_catalog)
+        refresh_after_days: Include crawled products older than this for
+            refresh; None disables refresh work
+        weights: Overrides for DEFAULT_WEIGHTS
+        now: Reference time for staleness (default: now)
+
+    Returns:
+        List of {"url", "kind" ("pending"/"refresh"), "type", "category",
+        "score"}, highest priority first
+    """
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    now = now or datetime.now()
+    crawled_at = state.get("crawled_at", {})
+
+    type_counts = {t.value: 0 for t in ProductType}
+    category_counts: dict[str, int] = {}
+    categories_by_type: dict[str, dict[str, int]] = {}
+    for product in catalog["products"]:
+        type_counts[product["product_type"]] = type_counts.get(product["product_type"], 0) + 1
+        for category in product_categories(product):
+            category_counts[category] = category_counts.get(category, 0) + 1
+            by_type = categories_by_type.setdefault(product["product_type"], {})
+            by_type[category] = by_type.get(category, 0) + 1
+    type_categories = {t: max(counts, key=counts.get) for t, counts in categories_by_type.items()}
+
+    candidates = []
+    for url in dict.fromkeys(state["pending"]):
+        candidates.append({
+            "url": url,
+            "kind": "pending",
+            "type": guess_product_type(url),
+            "category": pending_category(url, type_categories, set(category_counts)),
+            "base": weights["new"],
+        })
+
+    if refresh_after_days is not None:
+        for product in catalog["products"]:
+            age = _age_days(crawled_at.get(product["url"]), now)
+            if age is not None and age < refresh_after_days:
+                continue
+            # Unknown age counts as maximally stale
+            if age is None or refresh_after_days <= 0:
+                staleness = 1.0
+            else:
+                staleness = min(age / refresh_after_days, 2.0) / 2
+            # A product listed in several categories counts for the thinnest
+            categories = product_categories(product)
+            candidates.append({
+                "url": product["url"],
+                "kind": "refresh",
+                "type": product["product_type"],
+                "category": min(categories, key=category_counts.get) if categories else None,
+                "base": weights["staleness"] * staleness,
+            })
+
+    for candidate in candidates:
+        failures = failure_attempts(state, candidate["url"])
+        candidate["base"] -= weights["failures"] * failures / (failures + 1)
+
+    # Greedy selection: the balance and coverage components depend on what
+    # has been picked so far, so keep one heap per (type, category) and
+    # compare their heads
+    heaps: dict[tuple[str | None, str | None], list] = {}
+    for n, candidate in enumerate(candidates):
+        key = (candidate["type"], candidate["category"])
+        heapq.heappush(heaps.setdefault(key, []), (-candidate["base"], n, candidate))
+
+    total = sum(type_counts.values())
+    type_share = 1 / len(type_counts)
+    ordered = []
+    while heaps:
+        largest = max(category_counts.values(), default=0)
+        best_key, best_score = None, None
+        for key, heap in heaps.items():
+            product_type, category = key
+            # Unknown type: assume an average share
+            share = type_counts.get(product_type, 0) / total if product_type and total else type_share
+            # Coverage gap: 1 for an empty category, 0 for the largest; unknown in between
+            if category is None:
+                gap = 0.5
+            else:
+                gap = 1 - category_counts.get(category, 0) / largest if largest else 1.0
+            score = -heap[0][0] + weights["balance"] * (1 - share) + weights["coverage"] * gap
+            if best_score is None or score > best_score:
+                best_key, best_score = key, score
+
+        _, _, candidate = heapq.heappop(heaps[best_key])
+        if not heaps[best_key]:
+            del heaps[best_key]
+        candidate["score"] = round(best_score, 4)
+        del candidate["base"]
+        ordered.append(candidate)
+
+        if candidate["kind"] == "pending":
+            product_type, category = best_key
+            if product_type is not None:
+                type_counts[product_type] = type_counts.get(product_type, 0) + 1
+                total += 1
+            if category is not None:
+                category_counts[category] = category_counts.get(category, 0) + 1
+
+    return ordered
+
+
+# =============================================================================
+# Execution
+# =============================================================================
+
+def crawl_scheduled(
+    limit: int | None = None,
+    max_credits: int | None = None,
+    max_requests: int | None = None,
+    refresh_after_days: float | None = None,
+    weights: dict | None = None,
+    urls_path: Path = DEFAULT_URLS_PATH,
+    products_path: Path = DEFAULT_PRODUCTS_PATH,
+    local: bool = True,
+    archive: PageArchive | None = None
+) -> dict:
+    """
+    Crawl pending and stale URLs in priority order within a budget.
+
+    Stops before a URL whose worst-case cost would exceed max_credits or
+    max_requests, so the budget is a hard cap. Pending URLs whose ref is
+    already in the catalog are recorded as alternate URLs without fetching
+    (and without counting against the budget).
+
+    Returns:
+        Summary dict: extracted, duplicates, refreshed, failed (URLs),
+        credits, requests
+    """
+    state = load_url_state(urls_path)
+    catalog = load_catalog(products_path)
+    plan = plan_crawl(state, catalog, refresh_after_days, weights)
+    if limit:
+        plan = plan[:limit]
+
+    if not plan:
+        logger.info("Nothing to crawl. Run with --map first.")
+        return {"extracted": 0, "duplicates": 0, "refreshed": 0, "failed": [], "credits": 0, "requests": 0}
+
+    cost = worst_case_cost(local)
+    new_products = []
+    duplicate_urls = []
+    refreshed = {}
+    failed = []
+    pending = set(state["pending"])
+    index = DedupIndex(catalog["products"])
+    budget_reached = False
+
+    with metered(max_credits, max_requests) as meter:
+        for i, item in enumerate(plan, 1):
+            url = item["url"]
+            # Known products cost nothing: resolve them before the budget check
+            if item["kind"] == "pending":
+                known = index.find_url(url)
+                if known is not None:
+                    pending.discard(url)
+                    duplicate_urls.append(url)
+                    mark_crawled(state, url)
+                    logger.info(f"Duplicate of {known['url']} (ref {known.get('ref')}), skipped: {url}")
+                    continue
+
+            # Once the budget is reached, keep going only to resolve free duplicates
+            if budget_reached:
+                continue
+            if not meter.can_afford(*cost):
+                logger.info(f"Budget reached after {i - 1} URLs ({meter.credits} credits, {meter.requests} requests)")
+                budget_reached = True
+                continue
+
+            logger.info(f"Processing {i}/{len(plan)} [{item['kind']}, {item['type'] or '?'}, {item['score']}]: {url}")
+            product, error = try_extract_product(url, local=local, archive=archive)
+
+            if item["kind"] == "refresh":
+                # A failed refresh keeps the catalog entry, so the URL stays
+                # crawled; only the ledger records the failure
+                if product:
+                    refreshed[url] = product.model_dump(mode="json")
+                    state.setdefault("crawled_at", {})[url] = datetime.now().isoformat()
+                    state["failures"].pop(url, None)
+                else:
+                    failed.append(url)
+                    record_failure(state, url, error)
+                continue
+
+            pending.discard(url)
+            if product:
+                new_products.append(product)
+                index.add(product.model_dump(mode="json"))
+                mark_crawled(state, url)
+            else:
+                failed.append(url)
+                mark_failed(state, url, error)
+
+        credits, requests = meter.credits, meter.requests
+
+    state["pending"] = [url for url in state["pending"] if url in pending]
+    state["metadata"]["last_crawl_at"] = datetime.now().isoformat()
+    save_url_state(state, urls_path)
+    if archive is not None:
+        archive.save()
+
+    if refreshed:
+        _apply_refresh(refreshed, products_path)
+    if new_products or duplicate_urls:
+        append_products(new_products, products_path, duplicate_urls=duplicate_urls)
+
+    logger.info(f"Scheduled crawl used {credits} credits in {requests} requests")
+    return {
+        "extracted": len(new_products),
+        "duplicates": len(duplicate_urls),
+        "refreshed": len(refreshed),
+        "failed": failed,
+        "credits": credits,
+        "requests": requests,
+    }
+
+
+def _apply_refresh(refreshed: dict[str, dict], products_path: Path) -> None:
+    """Replace refreshed products in the catalog, keeping dedup fields."""
+    catalog = load_catalog(products_path)
+    for product in catalog["products"]:
+        new_data = refreshed.get(product["url"])
+        if new_data is None:
+            continue
+        for key, value in new_data.items():
+            if key in ("categories", "alt_urls"):
+                continue
+            if value is not None or product.get(key) is None:
+                product[key] = value
+
+    catalog["metadata"]["last_updated_at"] = datetime.now().isoformat()
+    with open(products_path, "w", encoding="utf-8") as f:
+        json.dump(catalog, f, ensure_ascii=False, indent=2)
+    logger.info(f"Refreshed {len(refreshed)} products in catalog")
@@ -23,6 +23,10 @@ class NutriScore(str, Enum):
     E = "E"
 
 
+# Fields maintained by the crawler rather than extracted from the page
+CATALOG_FIELDS = {"url", "categories", "alt_urls"}
+
+
 class Product(BaseModel):
     name: str = Field(description="Product name")
     ref: str | None = Field(default=None, description="Product reference ID (e.g., '060489' from Ref.: 060489)")
@@ -45,3 +49,7 @@ class Product(BaseModel):
     # For budget planning
     weight_grams: int | None = Field(default=None, description="Net weight in grams")
     servings: int | None = Field(default=None, description="Number of portions")
+
+    # Deduplication (filled when the same product is found under several URLs)
+    categories: list[str] = Field(default_factory=list, description="All categories the product is listed under")
+    alt_urls: list[str] = Field(default_factory=list, description="Other URLs of the same product")
@@ -0,0 +1,65 @@
+"""Local extraction over the saved page corpus in tests/pages."""
+from pathlib import Path
+
+from scraper.extractors import REQUIRED_FIELDS, coverage_report, extract_local, guess_product_type, missing_fields
+
+PAGES_DIR = Path(__file__).parent / "pages"
+
+# Pages each field is extracted from (4 pages: JSON-LD, microdata,
+# markdown-only and an empty page). Update when pages or extractors change.
+EXPECTED_COVERAGE = {
+    "name": 2,
+    "ref": 3,
+    "price": 2,
+    "price_per_kg": 2,
+    "category": 1,
+    "product_type": 0,
+    "image_url": 2,
+    "nutriscore": 3,
+    "is_vegetarian": 0,
+    "is_vegan": 0,
+    "is_gluten_free": 0,
+    "is_lactose_free": 0,
+    "weight_grams": 3,
+    "servings": 2,
+}
+
+
+def test_coverage_report():
+    report = coverage_report(PAGES_DIR)
+    assert report["pages"] == 4
+    assert report["fields"] == EXPECTED_COVERAGE
+
+
+def test_json_ld_page_only_needs_type_from_llm():
+    path = PAGES_DIR / "lasagnes-a-la-bolognaise-000000060489.html"
+    fields = extract_local(path.stem, html=path.read_text(encoding="utf-8"))
+    assert fields == {
+        "name": "Lasagnes à la bolognaise",
+        "ref": "060489",
+        "price": 6.5,
+        "price_per_kg": 13.0,
+        "category": "Plats cuisinés > Pâtes et lasagnes",
+        "image_url": "https://www.picard.fr/dw/image/060489.jpg",
+        "nutriscore": "B",
+        "weight_grams": 500,
+        "servings": 2,
+    }
+    # The type is never guessed from the URL slug at extraction time
+    assert missing_fields(fields, REQUIRED_FIELDS) == ["product_type"]
+
+
+def test_microdata_page_with_nbsp_and_kg_weight():
+    path = PAGES_DIR / "filets-de-saumon-atlantique-000000071234.html"
+    fields = extract_local(path.stem, html=path.read_text(encoding="utf-8"))
+    assert fields["price"] == 15.95
+    assert fields["price_per_kg"] == 31.9
+    assert fields["weight_grams"] == 500
+    # No breadcrumb: category must come from the LLM
+    assert missing_fields(fields, REQUIRED_FIELDS) == ["category", "product_type"]
+
+
+def test_guess_product_type_matches_plural_slugs():
+    assert guess_product_type("https://www.picard.fr/produits/pizzas-margherita-000000012345.html") == "ready_meal"
+    assert guess_product_type("https://www.picard.fr/produits/quiches-lorraines-000000012346.html") == "ready_meal"
+    assert guess_product_type("https://www.picard.fr/produits/page-sans-donnees.html") is None